@@ -0,0 +1,63 @@
+"""Memory benchmark: today's dict tickets vs the slotted Ticket model.
+
+Usage: python bench_ticket_memory.py [count]
+"""
+import gc
+import json
+import sys
+import tracemalloc
+from datetime import datetime, timedelta
+
+import ticket_bot
+
+
+def make_v1_file(count: int):
+    # Same layout load_tickets used to return: {guild: {channel: dict}}
+    start = datetime(2025, 1, 1)
+    guild = {}
+    for i in range(count):
+        created = start + timedelta(minutes=i)
+        guild[str(1_000_000_000_000_000_000 + i)] = {
+            "user_id": 500_000_000_000_000_000 + i % 5000,
+            "type": ticket_bot.TICKET_CATEGORIES[i % len(ticket_bot.TICKET_CATEGORIES)],
+            "order_link": None,
+            "created_at": created.isoformat(),
+            "status": "closed" if i % 3 else "open",
+            "preview_message_id": None,
+            "order_details": {
+                "account_name": "Not set",
+                "payment_methods": "Not set (chef will confirm in ticket)",
+                "tip": "$0",
+                "delivery_type": "Leave at my door",
+                "delivery_notes": "N/A",
+            },
+            "closed_at": (created + timedelta(hours=2)).isoformat() if i % 3 else None,
+        }
+    # Round-trip through JSON so strings aren't shared, as after a real load
+    return json.dumps({"123456789012345678": guild})
+
+
+def measure(build):
+    gc.collect()
+    tracemalloc.start()
+    data = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return data, current
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    raw = make_v1_file(count)
+
+    dicts, dict_bytes = measure(lambda: json.loads(raw))
+    tickets, model_bytes = measure(lambda: ticket_bot.tickets_from_file(dicts))
+
+    print(f"{count:,} tickets")
+    print(f"  dict records:   {dict_bytes / 1e6:8.1f} MB ({dict_bytes / count:.0f} B/ticket)")
+    print(f"  Ticket records: {model_bytes / 1e6:8.1f} MB ({model_bytes / count:.0f} B/ticket)")
+    print(f"  saved:          {(1 - model_bytes / dict_bytes) * 100:8.1f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""Two-process check of the data lock handover.
+
+Starts a writer that keeps creating tickets, then a second instance on the
+same TICKETBOT_DATA_DIR. The second one must start read-only, ask for the
+lock, take over once the writer flushes and steps down, and end up with
+every ticket the writer created, both on disk and in its dispatch queue.
+
+Usage: python check_store_handover.py
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import ticket_bot
+
+GUILD_ID = 1
+READER_CHANNEL_ID = 999_999
+
+# Shared by both children: no Discord login, bot.close() just ends the run
+CHILD_SETUP = """
+import asyncio, json, sys
+import ticket_bot as tb
+
+tb.AUTO_CLOSE_AFTER_HOURS = 0
+closed = asyncio.Event()
+
+async def close():
+    closed.set()
+
+tb.bot.close = close
+tb.bot.wait_until_ready = asyncio.Event().wait
+"""
+
+WRITER = CHILD_SETUP + """
+assert tb.acquire_store_lock(wait=True)
+print("ready", flush=True)
+
+async def main():
+    tb._spawn(tb.store_loop())
+    created = 0
+    while not closed.is_set():
+        tb.create_ticket_record(%(guild)d, 1000 + created, 1, "New Order")
+        created += 1
+        await asyncio.sleep(0.02)
+    print(json.dumps({"created": created}), flush=True)
+
+asyncio.run(main())
+"""
+
+READER = CHILD_SETUP + """
+writable_at_start = tb.acquire_store_lock(wait=False)
+
+async def main():
+    tb._spawn(tb.store_loop())
+    for _ in range(200):
+        if tb.store_writable():
+            break
+        await asyncio.sleep(0.1)
+    took_over = tb.store_writable()
+    queued = tb.queue_length(%(guild)d)
+    tb.create_ticket_record(%(guild)d, %(reader)d, 2, "New Order")
+    tb.shutdown_store()
+    print(json.dumps({
+        "writable_at_start": writable_at_start,
+        "took_over": took_over,
+        "queued": queued,
+    }), flush=True)
+
+asyncio.run(main())
+"""
+
+
+def run_children(data_dir: str):
+    env = {**os.environ, "TICKETBOT_DATA_DIR": data_dir}
+    params = {"guild": GUILD_ID, "reader": READER_CHANNEL_ID}
+
+    writer = subprocess.Popen(
+        [sys.executable, "-c", WRITER % params], env=env, stdout=subprocess.PIPE, text=True
+    )
+    if writer.stdout.readline().strip() != "ready":
+        writer.kill()
+        raise SystemExit("writer did not get the lock")
+
+    reader = subprocess.run(
+        [sys.executable, "-c", READER % params], env=env, capture_output=True, text=True, timeout=60
+    )
+    writer_out, _ = writer.communicate(timeout=60)
+    if reader.returncode or writer.returncode:
+        print(reader.stderr, file=sys.stderr)
+        raise SystemExit("a child process failed")
+
+    return json.loads(writer_out.splitlines()[-1]), json.loads(reader.stdout.splitlines()[-1])
+
+
+def main():
+    with tempfile.TemporaryDirectory() as data_dir:
+        writer, reader = run_children(data_dir)
+        with open(os.path.join(data_dir, "tickets.json"), "r") as f:
+            tickets = ticket_bot.tickets_from_file(json.load(f)).get(GUILD_ID, {})
+
+    expected = {1000 + i for i in range(writer["created"])} | {READER_CHANNEL_ID}
+    missing = expected - set(tickets)
+    checks = [
+        ("second instance starts read-only", not reader["writable_at_start"]),
+        ("second instance takes over the lock", reader["took_over"]),
+        ("no tickets lost in the handover", not missing),
+        ("dispatch queue re-seeded after takeover", reader["queued"] == writer["created"]),
+    ]
+
+    print(f"writer created {writer['created']} tickets before handing over")
+    for name, ok in checks:
+        print(f"  {'ok  ' if ok else 'FAIL'} {name}")
+    if missing:
+        print(f"  missing: {sorted(missing)}")
+    return 0 if all(ok for _, ok in checks) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
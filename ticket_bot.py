@@ -1,11 +1,32 @@
 import discord
 from discord import app_commands
 from discord.ext import commands
+import argparse
+import asyncio
+import copy
+import cProfile
+import csv
+import functools
+import gzip
+import heapq
+import itertools
 import json
+import math
 import os
+import signal
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import dataclass, field
 from datetime import datetime
 from dotenv import load_dotenv
 
+try:
+    import fcntl
+except ImportError:  # not available on Windows
+    fcntl = None
+
 load_dotenv()
 
 # ================== CONFIG ==================
@@ -19,16 +40,105 @@ TICKET_CATEGORIES = [
     "Check Referral"
 ]
 
-# Category where ticket channels are created
+# Panel buttons, used for guilds that don't set their own "ticket_types"
+# in guild_config.json
+DEFAULT_TICKET_TYPES = [
+    {"name": "New Order", "label": "📝 New Order", "style": "green", "requires_link": True,
+     "description": "Submit a new group order", "custom_id": "ticket_new_order"},
+    {"name": "Order Issue", "label": "⚠️ Order Issue", "style": "red", "requires_link": True,
+     "description": "Report a problem with your order", "custom_id": "ticket_order_issue"},
+    {"name": "Refund Request", "label": "💰 Refund Request", "style": "red", "requires_link": True,
+     "description": "Request a refund", "custom_id": "ticket_refund"},
+    {"name": "Check Referral", "label": "🔗 Check Referral", "style": "primary", "requires_link": False,
+     "description": "Verify referral status", "custom_id": "ticket_referral"},
+    {"name": "General Support", "label": "❓ General Support", "style": "gray", "requires_link": False,
+     "description": "Other questions", "custom_id": "ticket_support"},
+]
+
+DEFAULT_BRANDING = {
+    "name": "OneEats",
+    "color": 0x00AEFF,
+    "open_color": 0x00FF00,
+    "closed_color": 0xFF0000,
+}
+
+# Category where ticket channels are created (until a guild has one by id)
 TICKET_CATEGORY_NAME = "Ticket"
 
 # Data files
-TICKETS_FILE = "tickets.json"
-STATUS_FILE = "status.json"
+DATA_DIR = os.getenv("TICKETBOT_DATA_DIR", ".")
+TICKETS_FILE = os.path.join(DATA_DIR, "tickets.json")
+TICKETS_ARCHIVE_FILE = os.path.join(DATA_DIR, "tickets_archive.jsonl")
+STATUS_FILE = os.path.join(DATA_DIR, "status.json")
+STATS_FILE = os.path.join(DATA_DIR, "stats.json")
+GUILD_CONFIG_FILE = os.path.join(DATA_DIR, "guild_config.json")
+LOCK_FILE = os.path.join(DATA_DIR, "ticketbot.lock")
+SNAPSHOT_DIR = os.path.join(DATA_DIR, "snapshots")
+
+# Compressed snapshots of all data: seconds between them, and how many to keep
+SNAPSHOT_INTERVAL = 15 * 60
+SNAPSHOT_KEEP = 48
+
+# Only one process may write the data files. A second instance either waits
+# for the lock ("wait") or starts read-only and takes over later ("readonly").
+STORE_LOCK_MODE = os.getenv("TICKETBOT_LOCK_MODE", "wait")
+# Seconds between flushes of pending writes
+STORE_FLUSH_INTERVAL = 1.0
+# The lock holder renews its lease this often; a lease this old means it's hung
+LOCK_RENEW_INTERVAL = 10
+LOCK_LEASE_SECONDS = 30
 
 # Status channel name
 STATUS_CHANNEL_NAME = "order-here"
 
+# Seconds between checks of guild_config.json for hand edits
+CONFIG_RELOAD_INTERVAL = 5
+
+# Auto-close tickets with no activity (0 disables)
+AUTO_CLOSE_AFTER_HOURS = 48
+# How long before auto-closing the user gets a warning
+AUTO_CLOSE_WARNING_HOURS = 12
+
+# Dispatch queue: head start in seconds per ticket type. An Order Issue
+# opened now sorts like a General Support ticket opened 30 minutes ago, so
+# urgent types jump ahead without starving the rest.
+TICKET_PRIORITY_BOOST = {
+    "Order Issue": 30 * 60,
+    "Refund Request": 30 * 60,
+    "New Order": 10 * 60,
+    "Check Referral": 0,
+    "General Support": 0,
+}
+# Hand new tickets to online staff round-robin instead of waiting for /claim
+# (needs the privileged Presence intent enabled for the bot)
+AUTO_ASSIGN_TICKETS = False
+
+# Default staff feed channel for batched "new order" digests, per-guild
+# feed_channel_id overrides it (0 posts in each ticket instead)
+STAFF_FEED_CHANNEL_ID = int(os.getenv("STAFF_FEED_CHANNEL_ID", "0"))
+# Seconds to collect submissions before posting a digest, and orders per digest
+DIGEST_WINDOW_SECONDS = 30
+DIGEST_MAX_ORDERS = 20
+
+# Profiling (off until /profile, SIGUSR1 or TICKETBOT_PROFILE): 1 in every N calls of a
+# target, at most this many profiles a minute, written to PROFILE_DIR
+PROFILE_DIR = os.path.join(DATA_DIR, "profiles")
+PROFILE_SAMPLE_EVERY = 10
+PROFILE_MAX_PER_MINUTE = 6
+# Comma-separated targets (or "all") to profile from startup, which is the
+# only way to catch load_tickets: it runs once, before /profile can be used
+PROFILE_AT_STARTUP = os.getenv("TICKETBOT_PROFILE", "")
+
+# Rows per Parquet row group when exporting
+EXPORT_BATCH_ROWS = 10_000
+# A running bot writes tickets.json up to STORE_FLUSH_INTERVAL late, so a
+# saved export cursor stays this many seconds behind the export's start
+EXPORT_CURSOR_LAG = 10
+
+# Bulk staff operations: channel edits/deletes in flight, seconds between progress edits
+BULK_CONCURRENCY = 3
+BULK_PROGRESS_INTERVAL = 2.0
+
 # ============================================
 
 # Bot setup
@@ -36,46 +146,414 @@ intents = discord.Intents.default()
 intents.message_content = True
 intents.members = True
 intents.guilds = True
+intents.presences = AUTO_ASSIGN_TICKETS
+
+# Commands that don't change the data files still work on a read-only instance
+READ_ONLY_COMMANDS = {"add", "remove", "stats", "queue", "profile", "export"}
+
+
+class TicketCommandTree(app_commands.CommandTree):
+    async def interaction_check(self, interaction: discord.Interaction):
+        # Autocomplete runs through here too but can't be answered with a message
+        if interaction.type is discord.InteractionType.autocomplete:
+            return True
+        if interaction.command and interaction.command.name in READ_ONLY_COMMANDS:
+            return True
+        return await check_store_writable(interaction)
+
+
+bot = commands.Bot(command_prefix="!", intents=intents, tree_cls=TicketCommandTree)
+
+# ========== PROFILING ==========
+
+# Targets currently being profiled. Empty means profiling is off and every
+# wrapped call costs one set lookup.
+_profile_targets = set()
+# name -> "cpu" | "memory" for everything wrapped with @profiled
+_profile_registry = {}
+_profile_state = {"calls": {}, "window_start": 0.0, "window_count": 0, "active": False}
+
+
+def profiled(name: str, memory: bool = False):
+    # cProfile (or, with memory=True, tracemalloc snapshots) around a sampled
+    # subset of calls, only while `name` is switched on with /profile
+    _profile_registry[name] = "memory" if memory else "cpu"
+
+    def decorate(func):
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                if name not in _profile_targets:
+                    return await func(*args, **kwargs)
+                session = _start_profile(name, memory)
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    _finish_profile(name, session)
+        else:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if name not in _profile_targets:
+                    return func(*args, **kwargs)
+                session = _start_profile(name, memory)
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    _finish_profile(name, session)
+        return wrapper
+
+    return decorate
+
+
+def _should_sample(name: str):
+    state = _profile_state
+    # Only one profile at a time: cProfile can't nest, and handlers
+    # overlapping on the event loop would end up in each other's profile
+    if state["active"]:
+        return False
+
+    calls = state["calls"][name] = state["calls"].get(name, 0) + 1
+    if (calls - 1) % PROFILE_SAMPLE_EVERY:
+        return False
+
+    now = time.monotonic()
+    if now - state["window_start"] >= 60:
+        state["window_start"] = now
+        state["window_count"] = 0
+    if state["window_count"] >= PROFILE_MAX_PER_MINUTE:
+        return False
+    state["window_count"] += 1
+    return True
+
+
+def _start_profile(name: str, memory: bool):
+    if not _should_sample(name):
+        return None
+    _profile_state["active"] = True
+    if memory:
+        # tracemalloc slows every allocation in the process, so it only
+        # runs for the sampled call (unless something else already started it)
+        started = not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start()
+        return ("memory", (started, tracemalloc.take_snapshot()))
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return ("cpu", profiler)
+
+
+def _finish_profile(name: str, session):
+    if session is None:
+        return
+    kind, data = session
+    if kind == "cpu":
+        data.disable()
+    else:
+        started, before = data
+        after = None
+        if tracemalloc.is_tracing():
+            # Leave out the snapshot bookkeeping itself
+            after = tracemalloc.take_snapshot().filter_traces(
+                (tracemalloc.Filter(False, tracemalloc.__file__),)
+            )
+        if started:
+            tracemalloc.stop()
+    try:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        base = os.path.join(
+            PROFILE_DIR, f"{name}-{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}-{os.getpid()}"
+        )
+        if kind == "cpu":
+            # Readable with pstats, snakeviz, gprof2dot...
+            data.dump_stats(f"{base}.prof")
+        elif after is not None:
+            # Load with tracemalloc.Snapshot.load() to dig further
+            after.dump(f"{base}.tracemalloc")
+            with open(f"{base}.txt", "w") as f:
+                for stat in after.compare_to(before, "lineno")[:25]:
+                    f.write(f"{stat}\n")
+        else:
+            print("[DEBUG] tracemalloc was stopped mid-call, no memory profile written.")
+    except OSError as e:
+        print("[DEBUG] Failed to write profile:", repr(e))
+    finally:
+        _profile_state["active"] = False
+
+
+def set_profiling(targets):
+    targets = {t for t in targets if t in _profile_registry}
+    _profile_targets.clear()
+    _profile_targets.update(targets)
+    _profile_state["calls"].clear()
+    return targets
+
+
+def start_profiling_from_env():
+    if not PROFILE_AT_STARTUP:
+        return
+    names = _profile_registry if PROFILE_AT_STARTUP == "all" else PROFILE_AT_STARTUP.split(",")
+    enabled = set_profiling(name.strip() for name in names)
+    print(f"🔬 Profiling from startup: {', '.join(sorted(enabled)) or 'no known targets'}")
+
+
+def toggle_profiling():
+    # SIGUSR1: everything on, or everything off again
+    enabled = set_profiling(() if _profile_targets else _profile_registry)
+    print(f"🔬 Profiling {'on: ' + ', '.join(sorted(enabled)) if enabled else 'off'}")
+
+
+# ========== TICKET MODEL ==========
+
+# Bump when the on-disk ticket layout changes and teach migrate_ticket_dict
+# how to upgrade the previous version.
+SCHEMA_VERSION = 2
+
+DEFAULT_ACCOUNT_NAME = "Not set"
+DEFAULT_PAYMENT_METHODS = "Not set (chef will confirm in ticket)"
+DEFAULT_TIP = "$0"
+DEFAULT_DELIVERY_TYPE = "Leave at my door"
+DEFAULT_DELIVERY_NOTES = "N/A"
+
+# Values that repeat across most tickets. Loading maps them back onto these
+# objects so 100k tickets share one copy of each instead of 100k copies.
+_SHARED_STRINGS = {
+    s: s for s in (
+        DEFAULT_ACCOUNT_NAME,
+        DEFAULT_PAYMENT_METHODS,
+        DEFAULT_TIP,
+        DEFAULT_DELIVERY_TYPE,
+        DEFAULT_DELIVERY_NOTES,
+        "Meet at my door",
+        "open",
+        "closed",
+        *TICKET_CATEGORIES,
+    )
+}
+
+
+def _shared(value):
+    if value.__class__ is str:
+        return _SHARED_STRINGS.get(value, value)
+    return value
+
+
+def _iso_to_epoch(value):
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+@dataclass(slots=True)
+class OrderDetails:
+    account_name: str = DEFAULT_ACCOUNT_NAME
+    payment_methods: str = DEFAULT_PAYMENT_METHODS
+    tip: str = DEFAULT_TIP
+    delivery_type: str = DEFAULT_DELIVERY_TYPE
+    delivery_notes: str = DEFAULT_DELIVERY_NOTES
+
+    def to_dict(self):
+        return {
+            "account_name": self.account_name,
+            "payment_methods": self.payment_methods,
+            "tip": self.tip,
+            "delivery_type": self.delivery_type,
+            "delivery_notes": self.delivery_notes,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        return cls(
+            _shared(data.get("account_name", DEFAULT_ACCOUNT_NAME)),
+            _shared(data.get("payment_methods", DEFAULT_PAYMENT_METHODS)),
+            _shared(data.get("tip", DEFAULT_TIP)),
+            _shared(data.get("delivery_type", DEFAULT_DELIVERY_TYPE)),
+            _shared(data.get("delivery_notes", DEFAULT_DELIVERY_NOTES)),
+        )
+
+
+@dataclass(slots=True)
+class Ticket:
+    guild_id: int
+    channel_id: int
+    user_id: int
+    type: str
+    # epoch seconds
+    created_at: float
+    order_link: str | None = None
+    status: str = "open"
+    closed_at: float | None = None
+    # message id for the preview embed
+    preview_message_id: int | None = None
+    order_submitted: bool = False
+    order_details: OrderDetails = field(default_factory=OrderDetails)
+    # staff member handling the ticket
+    claimed_by: int | None = None
+    claimed_at: float | None = None
+    # staff feed digest listing this order
+    digest_message_id: int | None = None
+    # last change to anything staff care about, for incremental exports
+    updated_at: float | None = None
+    # when the auto-close warning went out, cleared by the next message
+    inactivity_warned_at: float | None = None
+
+    def to_dict(self):
+        # guild/channel ids are the keys in tickets.json, so not repeated here
+        return {
+            "v": SCHEMA_VERSION,
+            "user_id": self.user_id,
+            "type": self.type,
+            "order_link": self.order_link,
+            "created_at": self.created_at,
+            "status": self.status,
+            "closed_at": self.closed_at,
+            "preview_message_id": self.preview_message_id,
+            "order_submitted": self.order_submitted,
+            "order_details": self.order_details.to_dict(),
+            "claimed_by": self.claimed_by,
+            "claimed_at": self.claimed_at,
+            "digest_message_id": self.digest_message_id,
+            "updated_at": self.updated_at,
+            "inactivity_warned_at": self.inactivity_warned_at,
+        }
+
+    @classmethod
+    def from_dict(cls, guild_id: int, channel_id: int, data: dict):
+        data = migrate_ticket_dict(data)
+        return cls(
+            int(guild_id),
+            int(channel_id),
+            int(data["user_id"]),
+            _shared(data.get("type")),
+            data.get("created_at") or 0.0,
+            data.get("order_link"),
+            _shared(data.get("status", "open")),
+            data.get("closed_at"),
+            data.get("preview_message_id"),
+            bool(data.get("order_submitted", False)),
+            OrderDetails.from_dict(data.get("order_details") or {}),
+            data.get("claimed_by"),
+            data.get("claimed_at"),
+            data.get("digest_message_id"),
+            data.get("updated_at"),
+            data.get("inactivity_warned_at"),
+        )
+
+
+def migrate_ticket_dict(data: dict):
+    version = data.get("v", 1)
+    if version < 2:
+        # v1: ISO timestamp strings, no version field
+        data = dict(data)
+        data["created_at"] = _iso_to_epoch(data.get("created_at"))
+        data["closed_at"] = _iso_to_epoch(data.get("closed_at"))
+        data["v"] = 2
+    return data
+
+
+def tickets_from_file(raw: dict):
+    # v1 files are {guild_id: {channel_id: ticket}} at the top level
+    if "schema_version" in raw:
+        raw = raw.get("guilds", {})
+    return {
+        int(guild_id): {
+            int(channel_id): Ticket.from_dict(guild_id, channel_id, data)
+            for channel_id, data in guild_tickets.items()
+        }
+        for guild_id, guild_tickets in raw.items()
+    }
+
+
+def tickets_to_file(tickets: dict):
+    return {
+        "schema_version": SCHEMA_VERSION,
+        "guilds": {
+            str(guild_id): {
+                str(channel_id): ticket.to_dict()
+                for channel_id, ticket in guild_tickets.items()
+            }
+            for guild_id, guild_tickets in tickets.items()
+        },
+    }
 
-bot = commands.Bot(command_prefix="!", intents=intents)
 
 # ========== DATA HELPERS ==========
 
-def load_tickets():
-    if os.path.exists(TICKETS_FILE):
+# The data files are read once and kept in memory. save_* only marks a
+# store dirty; pending writes are flushed atomically by the store task
+# (or right away when no event loop is running, e.g. from a script).
+_tickets_cache = None
+_status_cache = None
+
+
+def _read_json_file(path: str, snapshot_key: str | None = None):
+    if os.path.exists(path):
         try:
-            with open(TICKETS_FILE, "r") as f:
+            with open(path, "r") as f:
                 content = f.read().strip()
                 if not content:
                     return {}
                 return json.loads(content)
         except json.JSONDecodeError:
-            print("⚠️ Warning: tickets.json is corrupted. Starting fresh.")
+            if snapshot_key:
+                data, snapshot = recover_from_snapshot(snapshot_key)
+                if data is not None:
+                    print(
+                        f"⚠️ Warning: {os.path.basename(path)} is corrupted. "
+                        f"Recovered it from {os.path.basename(snapshot)}."
+                    )
+                    if store_writable():
+                        # Keep the broken file around for a look later
+                        os.replace(path, f"{path}.corrupt-{int(time.time())}")
+                        _write_json_file(path, data)
+                    return data
+            print(f"⚠️ Warning: {os.path.basename(path)} is corrupted. Starting fresh.")
             return {}
     return {}
 
 
-def save_tickets(data):
-    with open(TICKETS_FILE, "w") as f:
+def _write_json_file(path: str, data):
+    # Write to a temp file and rename, so readers never see a half-written file
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
         json.dump(data, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def load_tickets():
+    # {guild_id: {channel_id: Ticket}}
+    global _tickets_cache
+    if _tickets_cache is None:
+        _tickets_cache = _load_tickets_from_disk()
+    return _tickets_cache
+
+
+@profiled("load_tickets", memory=True)
+def _load_tickets_from_disk():
+    return tickets_from_file(_read_json_file(TICKETS_FILE, snapshot_key="tickets"))
+
+
+def save_tickets(data):
+    global _tickets_cache
+    _tickets_cache = data
+    mark_store_dirty("tickets")
 
 
 def load_status():
-    if os.path.exists(STATUS_FILE):
-        try:
-            with open(STATUS_FILE, "r") as f:
-                content = f.read().strip()
-                if not content:
-                    return {}
-                return json.loads(content)
-        except json.JSONDecodeError:
-            return {}
-    return {}
+    global _status_cache
+    if _status_cache is None:
+        _status_cache = _read_json_file(STATUS_FILE, snapshot_key="status")
+    return _status_cache
 
 
 def save_status(data):
-    with open(STATUS_FILE, "w") as f:
-        json.dump(data, f, indent=2)
+    global _status_cache
+    _status_cache = data
+    mark_store_dirty("status")
 
 
 def get_server_status(guild_id: int):
@@ -101,146 +579,1419 @@ def set_server_status(guild_id: int, is_open: bool, message_id=None, channel_id=
 
 def get_ticket_data_for_guild(guild_id: int):
     tickets = load_tickets()
-    guild_id_str = str(guild_id)
-    if guild_id_str not in tickets:
-        tickets[guild_id_str] = {}
+    if guild_id not in tickets:
+        tickets[guild_id] = {}
         save_tickets(tickets)
-    return tickets[guild_id_str]
+    return tickets[guild_id]
 
 
 def get_ticket_record(guild_id: int, channel_id: int):
     tickets = load_tickets()
-    g = tickets.get(str(guild_id), {})
-    return g.get(str(channel_id))
+    g = tickets.get(guild_id, {})
+    return g.get(channel_id)
 
 
 def create_ticket_record(guild_id: int, channel_id: int, user_id: int,
                          ticket_type: str, order_link: str | None = None):
     tickets = load_tickets()
-    guild_id_str = str(guild_id)
-    channel_id_str = str(channel_id)
-
-    if guild_id_str not in tickets:
-        tickets[guild_id_str] = {}
-
-    tickets[guild_id_str][channel_id_str] = {
-        "user_id": user_id,
-        "type": ticket_type,
-        "order_link": order_link,
-        "created_at": datetime.now().isoformat(),
-        "status": "open",
-        # message id for the preview embed
-        "preview_message_id": None,
-        # order form fields
-        "order_details": {
-            "account_name": "Not set",
-            "payment_methods": "Not set (chef will confirm in ticket)",
-            "tip": "$0",
-            "delivery_type": "Leave at my door",
-            "delivery_notes": "N/A",
-        },
-    }
 
+    # Stats before the ticket is in the cache, so a first-run rebuild
+    # doesn't count it twice
+    record_ticket_created(guild_id, ticket_type)
+
+    if guild_id not in tickets:
+        tickets[guild_id] = {}
+
+    created_at = time.time()
+    tickets[guild_id][channel_id] = Ticket(
+        guild_id=guild_id,
+        channel_id=channel_id,
+        user_id=user_id,
+        type=_shared(ticket_type),
+        created_at=created_at,
+        order_link=order_link,
+        updated_at=created_at,
+    )
     save_tickets(tickets)
 
 
 def set_ticket_preview_message_id(guild_id: int, channel_id: int, message_id: int):
     tickets = load_tickets()
-    g = tickets.get(str(guild_id))
+    g = tickets.get(guild_id)
     if not g:
         return
-    c = g.get(str(channel_id))
+    c = g.get(channel_id)
     if not c:
         return
-    c["preview_message_id"] = message_id
+    c.preview_message_id = message_id
     save_tickets(tickets)
 
 
+def set_inactivity_warning(guild_id: int, channel_id: int, warned_at: float | None):
+    ticket = get_ticket_record(guild_id, channel_id)
+    if ticket is None or ticket.inactivity_warned_at == warned_at:
+        return
+    ticket.inactivity_warned_at = warned_at
+    save_tickets(load_tickets())
+
+
 def close_ticket_record(guild_id: int, channel_id: int):
+    # False if the ticket was already closed (or doesn't exist)
+    return bool(close_ticket_records(guild_id, [channel_id]))
+
+
+def close_ticket_records(guild_id: int, channel_ids):
+    # Closes many tickets with a single load/save of the store
     tickets = load_tickets()
-    guild_id_str = str(guild_id)
-    channel_id_str = str(channel_id)
+    guild_tickets = tickets.get(guild_id, {})
+    closed_at = time.time()
+    closed = []
+
+    for channel_id in channel_ids:
+        ticket = guild_tickets.get(channel_id)
+        # Closing twice would move closed_at and skew /bulkpurge
+        if ticket is None or ticket.status == "closed":
+            continue
+        note_ticket_closed(guild_id, ticket.type, ticket.created_at, closed_at)
+        closed.append(channel_id)
+        ticket.status = "closed"
+        ticket.closed_at = ticket.updated_at = closed_at
+        mark_digest_dirty(ticket)
+
+    if closed:
+        # Stats first so a first-run rebuild doesn't count these twice
+        save_stats()
+        save_tickets(tickets)
 
-    if guild_id_str in tickets and channel_id_str in tickets[guild_id_str]:
-        tickets[guild_id_str][channel_id_str]["status"] = "closed"
-        tickets[guild_id_str][channel_id_str]["closed_at"] = datetime.now().isoformat()
+    for channel_id in channel_ids:
+        untrack_ticket_activity(channel_id)
+        dequeue_ticket(guild_id, channel_id)
+    return closed
+
+
+def archive_ticket_records(guild_id: int, channel_ids):
+    # Moves records out of tickets.json into the append-only archive,
+    # again as one load/save of the store
+    tickets = load_tickets()
+    guild_tickets = tickets.get(guild_id, {})
+    archived = []
+
+    if not store_writable():
+        print("⚠️ Warning: store is read-only, not archiving tickets.")
+        return []
+
+    with open(TICKETS_ARCHIVE_FILE, "a") as f:
+        for channel_id in channel_ids:
+            ticket = guild_tickets.get(channel_id)
+            if ticket is None:
+                continue
+            record = {"guild_id": guild_id, "channel_id": channel_id, **ticket.to_dict()}
+            f.write(json.dumps(record) + "\n")
+            archived.append(channel_id)
+
+    # Archive is written before the store, so a crash duplicates rather than loses
+    for channel_id in archived:
+        del guild_tickets[channel_id]
+    if archived:
         save_tickets(tickets)
+    return archived
 
 
 def update_order_field(guild_id: int, channel_id: int, field: str, value: str):
     tickets = load_tickets()
-    g = tickets.get(str(guild_id))
+    g = tickets.get(guild_id)
     if not g:
         return
-    c = g.get(str(channel_id))
+    c = g.get(channel_id)
     if not c:
         return
-    details = c.setdefault("order_details", {})
-    details[field] = value
+    setattr(c.order_details, field, _shared(value))
+    c.updated_at = time.time()
     save_tickets(tickets)
 
 
 def build_order_preview_embed(guild_id: int, channel_id: int):
-    tickets = load_tickets()
-    guild_data = tickets.get(str(guild_id), {})
-    ticket = guild_data.get(str(channel_id))
+    ticket = get_ticket_record(guild_id, channel_id)
+    branding = get_guild_config(guild_id)["branding"]
 
     if not ticket:
         # Fallback embed if something goes wrong
         embed = discord.Embed(
-            title="OneEats • Preview",
+            title=f"{branding['name']} • Preview",
             description="Unable to load order preview.",
-            color=0x00AEFF,
+            color=branding["color"],
         )
         return embed
 
-    details = ticket.get("order_details", {})
-    order_link = ticket.get("order_link")
+    details = ticket.order_details
+    order_link = ticket.order_link
+
+    account_name = details.account_name
+    payment_methods = details.payment_methods
+    tip = details.tip
+    delivery_type = details.delivery_type
+    delivery_notes = details.delivery_notes
+
+    embed = discord.Embed(
+        title=f"{branding['name']} – Helper",
+        description="**Before you order...**\nReview your info before submitting your ticket.",
+        color=branding["color"],
+    )
+
+    # Group link
+    if order_link:
+        embed.add_field(
+            name="📎 Group Link:",
+            value=f"[Open Cart]({order_link})",
+            inline=False,
+        )
+    else:
+        embed.add_field(
+            name="📎 Group Link:",
+            value="Not set",
+            inline=False,
+        )
+
+    embed.add_field(name="🪪 Account Name:", value=account_name or DEFAULT_ACCOUNT_NAME, inline=False)
+    embed.add_field(
+        name="💳 Preferred Payment Methods:",
+        value=payment_methods or DEFAULT_PAYMENT_METHODS,
+        inline=False,
+    )
+    embed.add_field(name="💰 Tip:", value=tip or DEFAULT_TIP, inline=False)
+    embed.add_field(name="📦 Delivery Type:", value=delivery_type or DEFAULT_DELIVERY_TYPE, inline=False)
+    embed.add_field(name="📝 Delivery Notes:", value=delivery_notes or DEFAULT_DELIVERY_NOTES, inline=False)
+
+    embed.set_footer(text=f"{branding['name']} • Preview")
+    embed.timestamp = datetime.now()
+    return embed
+
+
+# ========== GUILD CONFIG ==========
+
+# Raw per-guild overrides from GUILD_CONFIG_FILE, keyed by guild id string
+_guild_config_raw = None
+_guild_config_mtime = None
+# guild_id -> overrides merged onto the defaults
+_guild_config_cache = {}
+
+
+def load_guild_configs():
+    global _guild_config_raw, _guild_config_mtime
+    if _guild_config_raw is None:
+        _guild_config_raw = _read_json_file(GUILD_CONFIG_FILE, snapshot_key="config")
+        _guild_config_mtime = _file_mtime(GUILD_CONFIG_FILE)
+    return _guild_config_raw
+
+
+def _file_mtime(path: str):
+    try:
+        return os.stat(path).st_mtime
+    except FileNotFoundError:
+        return None
+
+
+def _merge_ticket_type(ticket_type: dict):
+    return {
+        "label": ticket_type["name"],
+        "style": "secondary",
+        "requires_link": False,
+        "description": "",
+        "custom_id": f"ticket_type:{ticket_type['name']}",
+        **ticket_type,
+    }
+
+
+def get_guild_config(guild_id: int | None):
+    config = _guild_config_cache.get(guild_id)
+    if config is None:
+        overrides = load_guild_configs().get(str(guild_id), {})
+        config = {
+            "ticket_types": [
+                _merge_ticket_type(t) for t in overrides.get("ticket_types") or DEFAULT_TICKET_TYPES
+            ],
+            "category_name": overrides.get("category_name", TICKET_CATEGORY_NAME),
+            "category_id": overrides.get("category_id"),
+            "status_channel_id": overrides.get("status_channel_id"),
+            "feed_channel_id": overrides.get("feed_channel_id", STAFF_FEED_CHANNEL_ID or None),
+            "branding": {**DEFAULT_BRANDING, **overrides.get("branding", {})},
+        }
+        _guild_config_cache[guild_id] = config
+    return config
+
+
+def get_ticket_type(guild_id: int | None, name: str):
+    for ticket_type in get_guild_config(guild_id)["ticket_types"]:
+        if ticket_type["name"] == name:
+            return ticket_type
+    return None
+
+
+def set_guild_config_value(guild_id: int, key: str, value):
+    raw = load_guild_configs()
+    raw.setdefault(str(guild_id), {})[key] = value
+    _guild_config_cache.pop(guild_id, None)
+    mark_store_dirty("config")
+
+
+def reload_guild_config():
+    # Re-reads the file an admin edited. A half-saved or broken file keeps
+    # the config already loaded; snapshot recovery is only for startup.
+    global _guild_config_raw, _guild_config_mtime
+    mtime = _file_mtime(GUILD_CONFIG_FILE)
+    try:
+        with open(GUILD_CONFIG_FILE, "r") as f:
+            raw = json.loads(f.read())
+        if not isinstance(raw, dict):
+            raise ValueError("top level is not an object")
+    except FileNotFoundError:
+        raw = {}
+    except ValueError as e:
+        # Remember the mtime so a bad file is only reported once per edit
+        _guild_config_mtime = mtime
+        print(f"⚠️ Warning: {os.path.basename(GUILD_CONFIG_FILE)} could not be parsed ({e}), keeping the current config.")
+        return False
+
+    _guild_config_raw = raw
+    _guild_config_mtime = mtime
+    _guild_config_cache.clear()
+    return True
+
+
+async def guild_config_watch_loop():
+    # Picks up hand edits to the config file without a restart
+    while True:
+        await asyncio.sleep(CONFIG_RELOAD_INTERVAL)
+        if "config" in _dirty_stores:
+            continue
+        if _file_mtime(GUILD_CONFIG_FILE) != _guild_config_mtime and reload_guild_config():
+            print("🔄 Reloaded guild config.")
+
+
+# ========== STORE LOCK ==========
+
+class StoreLock:
+    # Advisory fcntl lock on LOCK_FILE. The kernel drops it if the process
+    # dies; the lease written into the file tells a waiting instance who
+    # holds it and whether the holder is still renewing.
+    def __init__(self, path: str):
+        self.path = path
+        self.fd = None
+
+    @property
+    def held(self):
+        return self.fd is not None
+
+    def try_acquire(self):
+        if self.fd is not None:
+            return True
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        self.fd = fd
+        self.renew()
+        return True
+
+    def renew(self):
+        lease = json.dumps({"pid": os.getpid(), "lease_until": time.time() + LOCK_LEASE_SECONDS})
+        os.ftruncate(self.fd, 0)
+        os.pwrite(self.fd, lease.encode(), 0)
+        os.fsync(self.fd)
+
+    def holder(self):
+        try:
+            with open(self.path, "r") as f:
+                return json.loads(f.read() or "{}")
+        except (OSError, json.JSONDecodeError):
+            return {}
+
+    def release(self):
+        if self.fd is None:
+            return
+        os.ftruncate(self.fd, 0)
+        fcntl.flock(self.fd, fcntl.LOCK_UN)
+        os.close(self.fd)
+        self.fd = None
+
+
+HANDOVER_FILE = f"{LOCK_FILE}.handover"
+
+_store_lock = None
+_dirty_stores = set()
+_readonly_warned = False
+
+
+def store_writable():
+    global _store_lock
+    if fcntl is None:
+        return True
+    if _store_lock is None:
+        # Scripts that never set up the lock take it on first write
+        _store_lock = StoreLock(LOCK_FILE)
+        _store_lock.try_acquire()
+    return _store_lock.held
+
+
+async def check_store_writable(interaction: discord.Interaction):
+    # Read-only instances refuse anything that would change tickets, so
+    # nothing is created on Discord that the data files never hear about
+    if store_writable():
+        return True
+    await interaction.response.send_message(
+        "⏳ This bot instance is read-only while another one hands over the data files. "
+        "Try again in a moment.",
+        ephemeral=True,
+    )
+    return False
+
+
+def mark_store_dirty(name: str):
+    global _readonly_warned, _store_generation
+    if not store_writable():
+        if not _readonly_warned:
+            print("⚠️ Warning: another instance holds the data lock, changes are not being saved.")
+            _readonly_warned = True
+        return
+
+    _dirty_stores.add(name)
+    _store_generation += 1
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        flush_pending_writes()
+
+
+@profiled("save_tickets", memory=True)
+def flush_pending_writes():
+    global _guild_config_mtime
+    if not _dirty_stores or not store_writable():
+        return
+    if "tickets" in _dirty_stores:
+        _write_json_file(TICKETS_FILE, tickets_to_file(_tickets_cache))
+    if "status" in _dirty_stores:
+        _write_json_file(STATUS_FILE, _status_cache)
+    if "stats" in _dirty_stores and _stats is not None:
+        _write_json_file(STATS_FILE, _stats_payload())
+    if "config" in _dirty_stores:
+        _write_json_file(GUILD_CONFIG_FILE, _guild_config_raw)
+        _guild_config_mtime = _file_mtime(GUILD_CONFIG_FILE)
+    _dirty_stores.clear()
+
+
+def reset_store_cache():
+    # Drop anything cached while read-only so the new writer starts from disk
+    global _tickets_cache, _status_cache, _stats, _guild_config_raw
+    _tickets_cache = _status_cache = _stats = _guild_config_raw = None
+    _dirty_stores.clear()
+    _guild_config_cache.clear()
+
+
+def _pid_alive(pid: int):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _request_handover():
+    with open(HANDOVER_FILE, "w") as f:
+        f.write(str(os.getpid()))
+
+
+def _handover_requested():
+    try:
+        with open(HANDOVER_FILE, "r") as f:
+            pid = int(f.read().strip() or 0)
+    except (OSError, ValueError):
+        return False
+    return pid != os.getpid() and _pid_alive(pid)
+
+
+def _lock_lease_expired():
+    # The holder is alive (the kernel would have dropped the lock otherwise)
+    # but hasn't renewed in LOCK_LEASE_SECONDS, so it is most likely hung
+    lease_until = _store_lock.holder().get("lease_until")
+    return lease_until is not None and lease_until < time.time()
+
+
+def _describe_lock_holder():
+    holder = _store_lock.holder()
+    if not holder:
+        return "another instance"
+    description = f"pid {holder.get('pid')}"
+    if _lock_lease_expired():
+        description += " (lease expired, it may be hung)"
+    return description
+
+
+def _warn_hung_lock_holder():
+    print(
+        f"🚨 The data lock holder, {_describe_lock_holder()}, stopped renewing its lease "
+        f"but still holds the lock. Running read-only until it lets go; check or kill it."
+    )
+
+
+def acquire_store_lock(wait: bool, handover: bool = True):
+    # Returns True once this process is the writer. With wait=False it
+    # gives up after one try and the bot starts read-only. Tools pass
+    # handover=False so a running bot isn't asked to step down.
+    global _store_lock
+    if fcntl is None:
+        print("⚠️ Warning: fcntl not available, running without the data lock.")
+        return True
+
+    _store_lock = StoreLock(LOCK_FILE)
+    if _store_lock.try_acquire():
+        return True
+
+    if not handover:
+        return False
+    _request_handover()
+    print(f"⏳ Data files are locked by {_describe_lock_holder()}, asked it to hand over.")
+    if not wait:
+        return False
+
+    while not _store_lock.try_acquire():
+        if _lock_lease_expired():
+            # Waiting on a hung holder would block startup forever
+            _warn_hung_lock_holder()
+            return False
+        time.sleep(STORE_FLUSH_INTERVAL)
+    _finish_takeover()
+    return True
+
+
+def _finish_takeover():
+    try:
+        os.remove(HANDOVER_FILE)
+    except FileNotFoundError:
+        pass
+    reset_store_cache()
+    print("🔐 Took over the data lock.")
+
+
+async def step_down():
+    # Hand the data files to the instance that asked for them
+    print("🔓 Another instance asked for the data lock, flushing and shutting down.")
+    flush_pending_writes()
+    _store_lock.release()
+    await bot.close()
+
+
+async def store_loop():
+    last_renewal = time.monotonic()
+    hung_warned = False
+
+    while True:
+        await asyncio.sleep(STORE_FLUSH_INTERVAL)
+
+        if _store_lock is None or fcntl is None:
+            flush_pending_writes()
+            continue
+
+        if not _store_lock.held:
+            # Read-only: keep trying until the old writer lets go
+            if _store_lock.try_acquire():
+                _finish_takeover()
+                start_writer_tasks()
+                last_renewal = time.monotonic()
+            elif _lock_lease_expired() != hung_warned:
+                # Warn once per hang rather than every tick
+                hung_warned = not hung_warned
+                if hung_warned:
+                    _warn_hung_lock_holder()
+            continue
+
+        flush_pending_writes()
+        if time.monotonic() - last_renewal >= LOCK_RENEW_INTERVAL:
+            _store_lock.renew()
+            last_renewal = time.monotonic()
+        if _handover_requested():
+            await step_down()
+            return
+
+
+def shutdown_store():
+    flush_pending_writes()
+    if _store_lock is not None:
+        _store_lock.release()
+
+
+# ========== SNAPSHOTS ==========
+
+_store_generation = 0
+
+
+def list_snapshots():
+    # Newest first
+    try:
+        names = os.listdir(SNAPSHOT_DIR)
+    except FileNotFoundError:
+        return []
+    return [
+        os.path.join(SNAPSHOT_DIR, name)
+        for name in sorted(names, reverse=True)
+        if name.startswith("snapshot-") and name.endswith(".json.gz")
+    ]
+
+
+def capture_snapshot():
+    # Copies the in-memory state on the event loop so the snapshot is
+    # consistent; encoding, compression and disk I/O happen off the loop.
+    load_stats()
+    return {
+        "schema_version": SCHEMA_VERSION,
+        "taken_at": time.time(),
+        "tickets": tickets_to_file(load_tickets()),
+        "status": copy.deepcopy(load_status()),
+        "stats": copy.deepcopy(_stats_payload()),
+        "config": copy.deepcopy(load_guild_configs()),
+    }
+
+
+def write_snapshot(payload: dict, keep_path: str | None = None):
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    stamp = datetime.fromtimestamp(payload["taken_at"]).strftime("%Y%m%d-%H%M%S-%f")
+    path = os.path.join(SNAPSHOT_DIR, f"snapshot-{stamp}.json.gz")
+    tmp_path = f"{path}.tmp"
+    with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+        json.dump(payload, f)
+    os.replace(tmp_path, path)
+
+    # keep_path: a snapshot that's about to be restored is never rotated out
+    for old in list_snapshots()[SNAPSHOT_KEEP:]:
+        if keep_path is None or not os.path.samefile(old, keep_path):
+            os.remove(old)
+    return path
+
+
+def read_snapshot(path: str):
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        data = json.load(f)
+    if not isinstance(data, dict) or "tickets" not in data:
+        raise ValueError(f"{path} is not a ticket snapshot")
+    return data
+
+
+def recover_from_snapshot(key: str):
+    # Newest snapshot whose `key` section is readable, or (None, None)
+    for path in list_snapshots():
+        try:
+            value = read_snapshot(path)[key]
+            if key == "tickets":
+                tickets_from_file(value)
+            return value, path
+        except (OSError, EOFError, ValueError, KeyError, TypeError):
+            continue
+    return None, None
+
+
+def restore_snapshot(data: dict):
+    # Fail before touching anything if the tickets don't load
+    tickets_from_file(data["tickets"])
+
+    _write_json_file(TICKETS_FILE, data["tickets"])
+    _write_json_file(STATUS_FILE, data.get("status") or {})
+    _write_json_file(GUILD_CONFIG_FILE, data.get("config") or {})
+    if data.get("stats"):
+        _write_json_file(STATS_FILE, data["stats"])
+    elif os.path.exists(STATS_FILE):
+        # Rebuilt from the restored tickets on next start
+        os.remove(STATS_FILE)
+    reset_store_cache()
+
+
+async def snapshot_loop():
+    last_generation = None
+
+    while True:
+        await asyncio.sleep(SNAPSHOT_INTERVAL)
+        if not store_writable() or _store_generation == last_generation:
+            continue
+
+        payload = capture_snapshot()
+        last_generation = _store_generation
+        try:
+            path = await asyncio.get_running_loop().run_in_executor(None, write_snapshot, payload)
+            print(f"💾 Snapshot written: {os.path.basename(path)}")
+        except OSError as e:
+            print("[ERROR] Failed to write snapshot:", repr(e))
+
+
+# ========== STATS ==========
+
+class DurationSketch:
+    # Log-bucketed histogram (DDSketch style). Quantiles come back within
+    # ~2% relative error and the bucket count stays bounded no matter how
+    # many tickets get closed, so reading a median never scans history.
+    RELATIVE_ACCURACY = 0.02
+    GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+    LOG_GAMMA = math.log(GAMMA)
+
+    def __init__(self, buckets: dict | None = None, zero_count: int = 0):
+        # bucket index -> count; durations under 1s go to zero_count
+        self.buckets = {int(k): v for k, v in (buckets or {}).items()}
+        self.zero_count = zero_count
+        self.count = zero_count + sum(self.buckets.values())
+
+    def add(self, seconds: float):
+        self.count += 1
+        if seconds < 1:
+            self.zero_count += 1
+            return
+        index = math.ceil(math.log(seconds) / self.LOG_GAMMA)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+
+    def quantile(self, q: float):
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if rank < seen:
+                # midpoint of the bucket (gamma^(i-1), gamma^i]
+                return 2 * self.GAMMA ** index / (self.GAMMA + 1)
+        return 2 * self.GAMMA ** max(self.buckets) / (self.GAMMA + 1)
+
+    def to_dict(self):
+        return {
+            "buckets": {str(k): v for k, v in self.buckets.items()},
+            "zero_count": self.zero_count,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        return cls(data.get("buckets"), data.get("zero_count", 0))
+
+
+# Running aggregates per guild, loaded once and updated in place:
+#   {guild_id: {"days": ..., "totals": ..., "time_to_close": ..., "time_to_claim": ...}}
+#   days:   {"YYYY-MM-DD": {"created": {type: n}, "submitted": {type: n}, "closed": {type: n}}}
+#   totals: same shape as a single day, across all time
+#   time_to_close / time_to_claim: {"all" | type: DurationSketch}
+_stats = None
+
+
+def _empty_bucket():
+    return {"created": {}, "submitted": {}, "closed": {}}
+
+
+def _empty_guild_stats():
+    return {"days": {}, "totals": _empty_bucket(), "time_to_close": {}, "time_to_claim": {}}
+
+
+def _bump(bucket: dict, counter: str, ticket_type: str | None):
+    counts = bucket[counter]
+    key = ticket_type or "Unknown"
+    counts[key] = counts.get(key, 0) + 1
+
+
+def _day_key(epoch: float):
+    return datetime.fromtimestamp(epoch).date().isoformat()
+
+
+def _count(guild_stats: dict, counter: str, ticket_type: str | None, when: float):
+    day = guild_stats["days"].setdefault(_day_key(when), _empty_bucket())
+    _bump(day, counter, ticket_type)
+    _bump(guild_stats["totals"], counter, ticket_type)
+
+
+def _rebuild_stats():
+    # One-off scan of the ticket history, live and archived, only used when
+    # there is no per-guild stats file yet (first run after upgrading).
+    stats = {}
+
+    for ticket, _ in iter_export_tickets():
+        guild_stats = stats.setdefault(ticket.guild_id, _empty_guild_stats())
+        if ticket.created_at:
+            _count(guild_stats, "created", ticket.type, ticket.created_at)
+            if ticket.order_submitted:
+                # submit time was never stored, creation day is the best guess
+                _count(guild_stats, "submitted", ticket.type, ticket.created_at)
+        if ticket.closed_at:
+            _count(guild_stats, "closed", ticket.type, ticket.closed_at)
+            if ticket.created_at:
+                _add_duration(guild_stats, "time_to_close", ticket.type, ticket.closed_at - ticket.created_at)
+        if ticket.claimed_at and ticket.created_at:
+            _add_duration(guild_stats, "time_to_claim", ticket.type, ticket.claimed_at - ticket.created_at)
+    return stats
+
+
+def _add_duration(guild_stats: dict, name: str, ticket_type: str | None, seconds: float):
+    sketches = guild_stats[name]
+    for key in ("all", ticket_type or "Unknown"):
+        sketches.setdefault(key, DurationSketch()).add(max(seconds, 0))
+
+
+def load_stats():
+    global _stats
+    if _stats is not None:
+        return _stats
+
+    if os.path.exists(STATS_FILE):
+        try:
+            with open(STATS_FILE, "r") as f:
+                raw = json.loads(f.read().strip() or "{}")
+            if "guilds" in raw:
+                _stats = {
+                    int(guild_id): {
+                        "days": data.get("days", {}),
+                        "totals": data.get("totals", _empty_bucket()),
+                        "time_to_close": {
+                            k: DurationSketch.from_dict(v)
+                            for k, v in data.get("time_to_close", {}).items()
+                        },
+                        "time_to_claim": {
+                            k: DurationSketch.from_dict(v)
+                            for k, v in data.get("time_to_claim", {}).items()
+                        },
+                    }
+                    for guild_id, data in raw["guilds"].items()
+                }
+                return _stats
+            if raw:
+                print("📊 stats.json is from before per-server stats. Rebuilding from tickets.")
+        except json.JSONDecodeError:
+            print("⚠️ Warning: stats.json is corrupted. Rebuilding from tickets.")
+
+    _stats = _rebuild_stats()
+    save_stats()
+    return _stats
+
+
+def get_guild_stats(guild_id: int):
+    # Read-only view, doesn't add an entry for guilds without tickets
+    return load_stats().get(guild_id) or _empty_guild_stats()
+
+
+def save_stats():
+    if _stats is None:
+        return
+    mark_store_dirty("stats")
+
+
+def _stats_payload():
+    return {
+        "guilds": {
+            str(guild_id): {
+                "days": guild_stats["days"],
+                "totals": guild_stats["totals"],
+                "time_to_close": {k: v.to_dict() for k, v in guild_stats["time_to_close"].items()},
+                "time_to_claim": {k: v.to_dict() for k, v in guild_stats["time_to_claim"].items()},
+            }
+            for guild_id, guild_stats in _stats.items()
+        }
+    }
+
+
+def _record(guild_id: int, counter: str, ticket_type: str | None, when: float | None = None):
+    guild_stats = load_stats().setdefault(guild_id, _empty_guild_stats())
+    _count(guild_stats, counter, ticket_type, when or time.time())
+    return guild_stats
+
+
+def record_ticket_created(guild_id: int, ticket_type: str):
+    _record(guild_id, "created", ticket_type)
+    save_stats()
+
+
+def record_order_submitted(guild_id: int, ticket_type: str | None):
+    _record(guild_id, "submitted", ticket_type)
+    save_stats()
+
+
+def note_ticket_closed(guild_id: int, ticket_type: str | None, created_at: float | None, closed_at: float):
+    # Updates the aggregates without saving, for callers closing in bulk
+    guild_stats = _record(guild_id, "closed", ticket_type, closed_at)
+    if created_at:
+        _add_duration(guild_stats, "time_to_close", ticket_type, closed_at - created_at)
+
+
+def record_ticket_claimed(guild_id: int, ticket_type: str | None, created_at: float | None, claimed_at: float):
+    guild_stats = load_stats().setdefault(guild_id, _empty_guild_stats())
+    if created_at:
+        _add_duration(guild_stats, "time_to_claim", ticket_type, claimed_at - created_at)
+        save_stats()
+
+
+def record_ticket_closed(guild_id: int, ticket_type: str | None, created_at: float | None, closed_at: float):
+    note_ticket_closed(guild_id, ticket_type, created_at, closed_at)
+    save_stats()
+
+
+def format_duration(seconds: float | None):
+    if seconds is None:
+        return "N/A"
+    minutes = int(seconds // 60)
+    if minutes < 60:
+        return f"{minutes}m"
+    hours, minutes = divmod(minutes, 60)
+    if hours < 24:
+        return f"{hours}h {minutes}m"
+    days, hours = divmod(hours, 24)
+    return f"{days}d {hours}h"
+
+
+def build_stats_embed(guild_id: int):
+    stats = get_guild_stats(guild_id)
+    today = stats["days"].get(datetime.now().date().isoformat(), _empty_bucket())
+    totals = stats["totals"]
+    sketches = stats["time_to_close"]
+    config = get_guild_config(guild_id)
+    branding = config["branding"]
+
+    embed = discord.Embed(title=f"📊 {branding['name']} • Ticket Stats", color=branding["color"])
+    embed.add_field(
+        name="Today",
+        value=(
+            f"Created: **{sum(today['created'].values())}**\n"
+            f"Orders submitted: **{sum(today['submitted'].values())}**\n"
+            f"Closed: **{sum(today['closed'].values())}**"
+        ),
+        inline=False,
+    )
+
+    lines = []
+    for ticket_type in (t["name"] for t in config["ticket_types"]):
+        sketch = sketches.get(ticket_type)
+        median = sketch.quantile(0.5) if sketch else None
+        lines.append(
+            f"**{ticket_type}** — today {today['created'].get(ticket_type, 0)}, "
+            f"all time {totals['created'].get(ticket_type, 0)}, "
+            f"median close {format_duration(median)}"
+        )
+    embed.add_field(name="By Type", value="\n".join(lines), inline=False)
+
+    overall = sketches.get("all")
+    embed.add_field(
+        name="⏱️ Median Time to Close",
+        value=format_duration(overall.quantile(0.5) if overall else None),
+        inline=True,
+    )
+    embed.add_field(
+        name="📥 Orders Submitted (all time)",
+        value=str(sum(totals["submitted"].values())),
+        inline=True,
+    )
+    embed.set_footer(text=f"{branding['name']} • Stats")
+    embed.timestamp = datetime.now()
+    return embed
+
+
+# ========== AUTO-CLOSE ==========
+
+# channel_id -> {"guild_id", "last_activity", "last_message", "warned"};
+# on_message only stamps times, the timer reschedules lazily.
+_ticket_activity = {}
+# (deadline, channel_id) min-heap, at most one live entry per tracked ticket.
+# Entries are never removed in place: a popped entry whose ticket was closed
+# or saw newer activity is dropped or pushed back with the real deadline.
+_auto_close_heap = []
+_auto_close_wakeup = asyncio.Event()
+_background_tasks = set()
+
+
+def _auto_close_deadline(state: dict):
+    close_at = state["last_activity"] + AUTO_CLOSE_AFTER_HOURS * 3600
+    if state["warned"]:
+        return close_at
+    return close_at - AUTO_CLOSE_WARNING_HOURS * 3600
+
+
+def track_ticket_activity(guild_id: int, channel_id: int, last_activity: float | None = None,
+                          warned: bool = False):
+    if AUTO_CLOSE_AFTER_HOURS <= 0 or channel_id in _ticket_activity:
+        return
+    state = {
+        "guild_id": guild_id,
+        "last_activity": last_activity or time.time(),
+        # only set by real messages, seeded timestamps don't count as activity
+        "last_message": None,
+        "warned": warned,
+    }
+    _ticket_activity[channel_id] = state
+    heapq.heappush(_auto_close_heap, (_auto_close_deadline(state), channel_id))
+    _auto_close_wakeup.set()
+
+
+def untrack_ticket_activity(channel_id: int):
+    # The heap entry goes stale and is dropped when it reaches the top
+    _ticket_activity.pop(channel_id, None)
+
+
+def touch_ticket_activity(channel_id: int):
+    state = _ticket_activity.get(channel_id)
+    if state:
+        if state["warned"]:
+            set_inactivity_warning(state["guild_id"], channel_id, None)
+        state["last_activity"] = state["last_message"] = time.time()
+        state["warned"] = False
+
+
+def seed_ticket_activity():
+    # Needs the guild cache, so it runs once the bot is ready. The clock
+    # starts at each channel's last message, so a restart doesn't reset it.
+    warn_after = (AUTO_CLOSE_AFTER_HOURS - AUTO_CLOSE_WARNING_HOURS) * 3600
+    latest_unwarned = time.time() - warn_after
+
+    for guild_tickets in load_tickets().values():
+        for ticket in guild_tickets.values():
+            if ticket.status != "open":
+                continue
+            last_activity = _last_message_time(ticket.channel_id) or ticket.created_at
+            warned = False
+            if ticket.inactivity_warned_at and last_activity <= ticket.inactivity_warned_at + 5:
+                # Nothing since our own warning: keep counting down from it
+                warned = True
+                last_activity = ticket.inactivity_warned_at - warn_after
+            elif last_activity < latest_unwarned:
+                # Already overdue: warn now and still give the full warning window
+                last_activity = latest_unwarned
+            track_ticket_activity(ticket.guild_id, ticket.channel_id, last_activity, warned)
+
+
+def _spawn(coro):
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+
+async def _warn_inactive_ticket(channel):
+    try:
+        await channel.send(
+            f"⏰ This ticket has had no activity for "
+            f"{AUTO_CLOSE_AFTER_HOURS - AUTO_CLOSE_WARNING_HOURS} hours and will be "
+            f"closed in {AUTO_CLOSE_WARNING_HOURS} hours. Send a message to keep it open."
+        )
+    except discord.HTTPException as e:
+        print("[DEBUG] Failed to send auto-close warning:", repr(e))
+
+
+async def _auto_close_ticket(channel_id: int, guild_id: int):
+    channel = bot.get_channel(channel_id)
+    if channel is None:
+        # Channel is already gone, just mark the record closed
+        close_ticket_record(guild_id, channel_id)
+        return
+    try:
+        await close_ticket_channel(
+            channel,
+            guild_id,
+            f"{bot.user.mention} after {AUTO_CLOSE_AFTER_HOURS} hours of inactivity",
+        )
+    except discord.HTTPException as e:
+        print("[DEBUG] Failed to auto-close ticket:", repr(e))
+
+
+async def auto_close_loop():
+    await bot.wait_until_ready()
+    seed_ticket_activity()
+
+    while True:
+        _auto_close_wakeup.clear()
+        now = time.time()
+
+        while _auto_close_heap and _auto_close_heap[0][0] <= now:
+            deadline, channel_id = heapq.heappop(_auto_close_heap)
+            state = _ticket_activity.get(channel_id)
+            if state is None:
+                continue
+
+            due = _auto_close_deadline(state)
+            if due > now:
+                # Activity since this entry was pushed, reschedule
+                heapq.heappush(_auto_close_heap, (due, channel_id))
+            elif not state["warned"]:
+                state["warned"] = True
+                set_inactivity_warning(state["guild_id"], channel_id, now)
+                heapq.heappush(_auto_close_heap, (_auto_close_deadline(state), channel_id))
+                channel = bot.get_channel(channel_id)
+                if channel is not None:
+                    _spawn(_warn_inactive_ticket(channel))
+            else:
+                untrack_ticket_activity(channel_id)
+                _spawn(_auto_close_ticket(channel_id, state["guild_id"]))
+
+        timeout = _auto_close_heap[0][0] - time.time() if _auto_close_heap else None
+        try:
+            await asyncio.wait_for(_auto_close_wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+
+# ========== DISPATCH ==========
+
+# guild_id -> [(priority, channel_id)] min-heap, lower priority goes first
+_dispatch_heaps = {}
+# guild_id -> {channel_id: priority} for live entries. Claiming or closing
+# only drops the ticket from here; its heap entry is skipped when popped.
+_dispatch_queued = {}
+# guild_id -> id of the staff member who got the last auto-assigned ticket
+_assign_cursor = {}
+
+
+def _dispatch_priority(ticket: Ticket):
+    return ticket.created_at - TICKET_PRIORITY_BOOST.get(ticket.type, 0)
+
+
+def enqueue_ticket(ticket: Ticket):
+    queued = _dispatch_queued.setdefault(ticket.guild_id, {})
+    if ticket.status != "open" or ticket.claimed_by or ticket.channel_id in queued:
+        return
+    priority = _dispatch_priority(ticket)
+    queued[ticket.channel_id] = priority
+    heapq.heappush(_dispatch_heaps.setdefault(ticket.guild_id, []), (priority, ticket.channel_id))
+
+
+def dequeue_ticket(guild_id: int, channel_id: int):
+    _dispatch_queued.get(guild_id, {}).pop(channel_id, None)
+
+
+def seed_dispatch_queue():
+    _dispatch_heaps.clear()
+    _dispatch_queued.clear()
+    for guild_id, guild_tickets in load_tickets().items():
+        queued = {
+            channel_id: _dispatch_priority(ticket)
+            for channel_id, ticket in guild_tickets.items()
+            if ticket.status == "open" and not ticket.claimed_by
+        }
+        heap = [(priority, channel_id) for channel_id, priority in queued.items()]
+        heapq.heapify(heap)
+        _dispatch_queued[guild_id] = queued
+        _dispatch_heaps[guild_id] = heap
+
+
+def _peek_queue(guild_id: int):
+    # Drops stale entries off the top; returns the live ticket that's next up
+    heap = _dispatch_heaps.get(guild_id, [])
+    queued = _dispatch_queued.get(guild_id, {})
+    while heap:
+        priority, channel_id = heap[0]
+        ticket = get_ticket_record(guild_id, channel_id)
+        if queued.get(channel_id) == priority and ticket and ticket.status == "open" and not ticket.claimed_by:
+            return ticket
+        heapq.heappop(heap)
+        if queued.get(channel_id) == priority:
+            # closed or claimed without going through the queue
+            del queued[channel_id]
+    return None
+
+
+def pop_next_ticket(guild_id: int):
+    ticket = _peek_queue(guild_id)
+    if ticket:
+        heapq.heappop(_dispatch_heaps[guild_id])
+        dequeue_ticket(guild_id, ticket.channel_id)
+    return ticket
+
+
+def queue_length(guild_id: int):
+    return len(_dispatch_queued.get(guild_id, {}))
+
+
+def claim_ticket_record(ticket: Ticket, staff_id: int):
+    claimed_at = time.time()
+    # Stats before claimed_at is set, so a first-run rebuild doesn't count it twice
+    record_ticket_claimed(ticket.guild_id, ticket.type, ticket.created_at, claimed_at)
+    ticket.claimed_by = staff_id
+    ticket.claimed_at = ticket.updated_at = claimed_at
+    dequeue_ticket(ticket.guild_id, ticket.channel_id)
+    save_tickets(load_tickets())
+    mark_digest_dirty(ticket)
+
+
+def _online_staff(guild):
+    return sorted(
+        (
+            m for m in guild.members
+            if not m.bot
+            and m.status != discord.Status.offline
+            and m.guild_permissions.manage_channels
+        ),
+        key=lambda m: m.id,
+    )
+
+
+def _next_staff_member(guild):
+    # Round-robin over online staff ordered by id, so people coming and
+    # going doesn't reset whose turn it is
+    staff = _online_staff(guild)
+    if not staff:
+        return None
+    last = _assign_cursor.get(guild.id, 0)
+    member = next((m for m in staff if m.id > last), staff[0])
+    _assign_cursor[guild.id] = member.id
+    return member
+
+
+async def assign_ticket(guild, ticket: Ticket, member):
+    claim_ticket_record(ticket, member.id)
+
+    channel = guild.get_channel(ticket.channel_id)
+    if channel is None:
+        return None
+    try:
+        await channel.set_permissions(member, read_messages=True, send_messages=True)
+        await channel.send(
+            f"🙋 {member.mention} is handling this ticket.",
+            allowed_mentions=discord.AllowedMentions(users=True),
+        )
+    except discord.HTTPException as e:
+        print("[DEBUG] Failed to announce ticket claim:", repr(e))
+    return channel
+
+
+async def dispatch_ticket(guild, ticket: Ticket):
+    if ticket.status != "open" or ticket.claimed_by:
+        return
+    if AUTO_ASSIGN_TICKETS:
+        member = _next_staff_member(guild)
+        if member is not None:
+            await assign_ticket(guild, ticket, member)
+            return
+    enqueue_ticket(ticket)
+
+
+def build_queue_embed(guild_id: int):
+    next_ticket = _peek_queue(guild_id)
+    claim_sketch = get_guild_stats(guild_id)["time_to_claim"].get("all")
+
+    branding = get_guild_config(guild_id)["branding"]
+    embed = discord.Embed(title=f"📋 {branding['name']} • Ticket Queue", color=branding["color"])
+    embed.add_field(name="Waiting", value=str(queue_length(guild_id)), inline=True)
+    embed.add_field(
+        name="Next Up",
+        value=(
+            f"<#{next_ticket.channel_id}> ({next_ticket.type}, waiting "
+            f"{format_duration(time.time() - next_ticket.created_at)})"
+            if next_ticket else "Nobody waiting"
+        ),
+        inline=True,
+    )
+    embed.add_field(
+        name="⏱️ Median Wait to Claim",
+        value=format_duration(claim_sketch.quantile(0.5) if claim_sketch else None),
+        inline=False,
+    )
+    embed.set_footer(text="Use /claim to take the next ticket")
+    embed.timestamp = datetime.now()
+    return embed
+
+
+# ========== STAFF FEED ==========
+
+# message_id -> (guild_id, [channel_id, ...]) for digests that can still change
+_digest_messages = {}
+# guild_id -> [channel_id, ...] submitted since the last digest went out
+_digest_pending = {}
+# digest message ids whose orders were claimed or closed since the last edit
+_digest_dirty = set()
+_digest_wakeup = asyncio.Event()
+
+
+def feed_enabled(guild_id: int):
+    return bool(get_guild_config(guild_id)["feed_channel_id"])
+
+
+def queue_order_for_digest(ticket: Ticket):
+    pending = _digest_pending.setdefault(ticket.guild_id, [])
+    if ticket.channel_id not in pending:
+        pending.append(ticket.channel_id)
+        _digest_wakeup.set()
+
+
+def mark_digest_dirty(ticket: Ticket):
+    if ticket.digest_message_id in _digest_messages:
+        _digest_dirty.add(ticket.digest_message_id)
+        _digest_wakeup.set()
+
+
+def seed_digests():
+    # Rebuild which orders each digest lists, so edits keep working after a restart
+    _digest_messages.clear()
+    for guild_id, guild_tickets in load_tickets().items():
+        for channel_id, ticket in guild_tickets.items():
+            if ticket.digest_message_id:
+                _, channel_ids = _digest_messages.setdefault(ticket.digest_message_id, (guild_id, []))
+                channel_ids.append(channel_id)
+
+
+def _digest_line(guild_id: int, channel_id: int):
+    ticket = get_ticket_record(guild_id, channel_id)
+    if ticket is None:
+        return f"📁 <#{channel_id}> • archived"
+
+    if ticket.status == "closed":
+        state = "🔒 Closed"
+    elif ticket.claimed_by:
+        state = f"🙋 <@{ticket.claimed_by}>"
+    else:
+        state = "🟡 Waiting"
+    details = ticket.order_details
+    return (
+        f"{state} • <#{channel_id}> • {ticket.type} • <@{ticket.user_id}> • "
+        f"tip {details.tip} • {details.delivery_type}"
+    )
+
+
+def build_digest_embed(guild_id: int, channel_ids):
+    branding = get_guild_config(guild_id)["branding"]
+    embed = discord.Embed(
+        title=f"📥 {len(channel_ids)} New Order(s) Submitted",
+        description="\n".join(_digest_line(guild_id, c) for c in channel_ids),
+        color=branding["color"],
+    )
+    embed.set_footer(text=f"{branding['name']} • Staff Feed • /claim to take the next ticket")
+    embed.timestamp = datetime.now()
+    return embed
+
+
+def _digest_finished(guild_id: int, channel_ids):
+    for channel_id in channel_ids:
+        ticket = get_ticket_record(guild_id, channel_id)
+        if ticket is not None and ticket.status != "closed":
+            return False
+    return True
+
+
+def _feed_channel(guild_id: int):
+    feed_channel_id = get_guild_config(guild_id)["feed_channel_id"]
+    return bot.get_channel(feed_channel_id) if feed_channel_id else None
+
+
+async def _announce_in_ticket_channels(guild_id: int, channel_ids):
+    # The feed can't be used, so staff get the old per-ticket message instead
+    for channel_id in channel_ids:
+        ticket = get_ticket_record(guild_id, channel_id)
+        channel = bot.get_channel(channel_id)
+        if ticket is None or ticket.status != "open" or channel is None:
+            continue
+        try:
+            await channel.send(
+                f"📥 New order submitted by <@{ticket.user_id}>.",
+                allowed_mentions=discord.AllowedMentions(users=True),
+            )
+        except discord.HTTPException as e:
+            print("[DEBUG] Failed to send order notice:", repr(e))
+
+
+def _requeue_digest_orders(guild_id: int, channel_ids):
+    # Back to the front of the queue for the next window
+    pending = _digest_pending.setdefault(guild_id, [])
+    pending[:0] = [channel_id for channel_id in channel_ids if channel_id not in pending]
+    _digest_wakeup.set()
+
+
+async def flush_digests():
+    # One message per batch of new orders
+    for guild_id, channel_ids in list(_digest_pending.items()):
+        del _digest_pending[guild_id]
+        feed = _feed_channel(guild_id)
+        if feed is None:
+            print(f"⚠️ Warning: staff feed channel for guild {guild_id} not found, posting in the tickets.")
+            await _announce_in_ticket_channels(guild_id, channel_ids)
+            continue
+        for start in range(0, len(channel_ids), DIGEST_MAX_ORDERS):
+            batch = channel_ids[start:start + DIGEST_MAX_ORDERS]
+            try:
+                message = await feed.send(embed=build_digest_embed(guild_id, batch))
+            except discord.Forbidden as e:
+                print("[DEBUG] No access to the staff feed, posting in the tickets:", repr(e))
+                await _announce_in_ticket_channels(guild_id, channel_ids[start:])
+                break
+            except discord.HTTPException as e:
+                print("[DEBUG] Failed to send order digest, retrying next window:", repr(e))
+                _requeue_digest_orders(guild_id, channel_ids[start:])
+                break
+            _digest_messages[message.id] = (guild_id, batch)
+            for channel_id in batch:
+                ticket = get_ticket_record(guild_id, channel_id)
+                if ticket:
+                    ticket.digest_message_id = message.id
+            save_tickets(load_tickets())
+
+    # Then one edit per digest that changed, however many of its orders did
+    while _digest_dirty:
+        message_id = _digest_dirty.pop()
+        guild_id, channel_ids = _digest_messages.get(message_id, (None, None))
+        feed = _feed_channel(guild_id) if guild_id is not None else None
+        if feed is None:
+            continue
+        try:
+            await feed.get_partial_message(message_id).edit(
+                embed=build_digest_embed(guild_id, channel_ids)
+            )
+        except discord.NotFound:
+            _digest_messages.pop(message_id, None)
+            continue
+        except discord.HTTPException as e:
+            print("[DEBUG] Failed to edit order digest:", repr(e))
+            continue
+        if _digest_finished(guild_id, channel_ids):
+            _digest_messages.pop(message_id, None)
+
+
+async def digest_loop():
+    await bot.wait_until_ready()
+
+    while True:
+        await _digest_wakeup.wait()
+        # Let the window fill up before sending
+        await asyncio.sleep(DIGEST_WINDOW_SECONDS)
+        _digest_wakeup.clear()
+        await flush_digests()
 
-    account_name = details.get("account_name", "Not set")
-    payment_methods = details.get(
-        "payment_methods", "Not set (chef will confirm in ticket)"
-    )
-    tip = details.get("tip", "$0")
-    delivery_type = details.get("delivery_type", "Leave at my door")
-    delivery_notes = details.get("delivery_notes", "N/A")
 
-    embed = discord.Embed(
-        title="OneEats – Helper",
-        description="**Before you order...**\nReview your info before submitting your ticket.",
-        color=0x00AEFF,
-    )
+# ========== EVENTS ==========
 
-    # Group link
-    if order_link:
-        embed.add_field(
-            name="📎 Group Link:",
-            value=f"[Open Cart]({order_link})",
-            inline=False,
+@bot.event
+async def setup_hook():
+    _spawn(store_loop())
+    try:
+        # Let SIGTERM go through bot.close() so pending writes get flushed
+        asyncio.get_running_loop().add_signal_handler(
+            signal.SIGTERM, lambda: _spawn(bot.close())
         )
+        # SIGUSR1 switches profiling of every target on/off
+        asyncio.get_running_loop().add_signal_handler(signal.SIGUSR1, toggle_profiling)
+    except (NotImplementedError, AttributeError):
+        pass
+
+    _spawn(snapshot_loop())
+    _spawn(guild_config_watch_loop())
+    if store_writable():
+        start_writer_tasks()
     else:
-        embed.add_field(
-            name="📎 Group Link:",
-            value="Not set",
-            inline=False,
-        )
+        # Keeps /queue useful until the lock comes through
+        seed_dispatch_queue()
 
-    embed.add_field(name="🪪 Account Name:", value=account_name or "Not set", inline=False)
-    embed.add_field(
-        name="💳 Preferred Payment Methods:",
-        value=payment_methods or "Not set (chef will confirm in ticket)",
-        inline=False,
-    )
-    embed.add_field(name="💰 Tip:", value=tip or "$0", inline=False)
-    embed.add_field(name="📦 Delivery Type:", value=delivery_type or "Leave at my door", inline=False)
-    embed.add_field(name="📝 Delivery Notes:", value=delivery_notes or "N/A", inline=False)
 
-    embed.set_footer(text="OneEats • Preview")
-    embed.timestamp = datetime.now()
-    return embed
+def start_writer_tasks():
+    # Seeds from the data files as they are now, so a read-only instance
+    # that takes over also picks up tickets the old writer created
+    seed_dispatch_queue()
+    seed_digests()
+    _spawn(digest_loop())
+    if AUTO_CLOSE_AFTER_HOURS > 0:
+        _spawn(auto_close_loop())
 
 
-# ========== EVENTS ==========
+@bot.listen("on_message")
+async def on_ticket_message(message: discord.Message):
+    if not message.author.bot:
+        touch_ticket_activity(message.channel.id)
+
 
 @bot.event
 async def on_ready():
@@ -290,14 +2041,14 @@ class PaymentModal(discord.ui.Modal, title="Set Payment Methods"):
 
         self.methods = discord.ui.TextInput(
             label="Payment methods (e.g. Cash App, Zelle)",
-            placeholder="Not set (chef will confirm in ticket)",
+            placeholder=DEFAULT_PAYMENT_METHODS,
             style=discord.TextStyle.paragraph,
             required=False,
         )
         self.add_item(self.methods)
 
     async def on_submit(self, interaction: discord.Interaction):
-        value = self.methods.value.strip() or "Not set (chef will confirm in ticket)"
+        value = self.methods.value.strip() or DEFAULT_PAYMENT_METHODS
         update_order_field(
             self.guild_id, self.channel_id, "payment_methods", value
         )
@@ -328,7 +2079,7 @@ class TipModal(discord.ui.Modal, title="Set Tip"):
         self.add_item(self.tip_amount)
 
     async def on_submit(self, interaction: discord.Interaction):
-        value = self.tip_amount.value.strip() or "$0"
+        value = self.tip_amount.value.strip() or DEFAULT_TIP
         if not value.startswith("$") and not value.endswith("%"):
             value = f"${value}"
         update_order_field(self.guild_id, self.channel_id, "tip", value)
@@ -359,7 +2110,7 @@ class NotesModal(discord.ui.Modal, title="Set Delivery Notes"):
         self.add_item(self.notes)
 
     async def on_submit(self, interaction: discord.Interaction):
-        value = self.notes.value.strip() or "N/A"
+        value = self.notes.value.strip() or DEFAULT_DELIVERY_NOTES
         update_order_field(self.guild_id, self.channel_id, "delivery_notes", value)
 
         channel = interaction.guild.get_channel(self.channel_id)
@@ -380,7 +2131,11 @@ class OrderFormView(discord.ui.View):
         self.guild_id = guild_id
         self.channel_id = channel_id
 
+    async def interaction_check(self, interaction: discord.Interaction):
+        return await check_store_writable(interaction)
+
     @discord.ui.button(label="Submit", style=discord.ButtonStyle.green, custom_id="order_submit_btn")
+    @profiled("OrderFormView.submit")
     async def submit(self, interaction: discord.Interaction, button: discord.ui.Button):
         ticket = get_ticket_record(self.guild_id, self.channel_id)
         if not ticket:
@@ -388,7 +2143,7 @@ class OrderFormView(discord.ui.View):
             return
 
         # Only ticket creator or staff can submit
-        if interaction.user.id != ticket["user_id"] and not interaction.user.guild_permissions.manage_channels:
+        if interaction.user.id != ticket.user_id and not interaction.user.guild_permissions.manage_channels:
             await interaction.response.send_message(
                 "❌ Only the ticket owner or staff can submit this order.",
                 ephemeral=True,
@@ -396,23 +2151,34 @@ class OrderFormView(discord.ui.View):
             return
 
         # Mark as submitted (optional flag)
-        tickets = load_tickets()
-        tickets[str(self.guild_id)][str(self.channel_id)]["order_submitted"] = True
-        save_tickets(tickets)
+        if not ticket.order_submitted:
+            record_order_submitted(self.guild_id, ticket.type)
+        ticket.order_submitted = True
+        ticket.updated_at = time.time()
+        save_tickets(load_tickets())
 
         # Disable all components
         for item in self.children:
             item.disabled = True
 
         embed = build_order_preview_embed(self.guild_id, self.channel_id)
-        embed.title = "OneEats – Order Submitted"
-        embed.set_footer(text="Order submitted • OneEats")
+        brand_name = get_guild_config(self.guild_id)["branding"]["name"]
+        embed.title = f"{brand_name} – Order Submitted"
+        embed.set_footer(text=f"Order submitted • {brand_name}")
 
         await interaction.response.edit_message(embed=embed, view=self)
-        await interaction.channel.send(
-            f"📥 New order submitted by {interaction.user.mention}.",
-            allowed_mentions=discord.AllowedMentions(users=True),
-        )
+        if feed_enabled(self.guild_id):
+            # Staff see it in the next digest instead of one message per order
+            if not ticket.digest_message_id:
+                queue_order_for_digest(ticket)
+        else:
+            await interaction.channel.send(
+                f"📥 New order submitted by {interaction.user.mention}.",
+                allowed_mentions=discord.AllowedMentions(users=True),
+            )
+
+        # No-op if it's already queued or claimed
+        await dispatch_ticket(interaction.guild, ticket)
 
     @discord.ui.button(label="Name", style=discord.ButtonStyle.secondary, custom_id="order_name_btn")
     async def set_name(self, interaction: discord.Interaction, button: discord.ui.Button):
@@ -421,7 +2187,7 @@ class OrderFormView(discord.ui.View):
             await interaction.response.send_message("❌ This is not a valid ticket.", ephemeral=True)
             return
 
-        modal = NameModal(self.guild_id, self.channel_id, ticket["preview_message_id"])
+        modal = NameModal(self.guild_id, self.channel_id, ticket.preview_message_id)
         await interaction.response.send_modal(modal)
 
     @discord.ui.button(label="Payment", style=discord.ButtonStyle.secondary, custom_id="order_payment_btn")
@@ -431,7 +2197,7 @@ class OrderFormView(discord.ui.View):
             await interaction.response.send_message("❌ This is not a valid ticket.", ephemeral=True)
             return
 
-        modal = PaymentModal(self.guild_id, self.channel_id, ticket["preview_message_id"])
+        modal = PaymentModal(self.guild_id, self.channel_id, ticket.preview_message_id)
         await interaction.response.send_modal(modal)
 
     @discord.ui.button(label="Tip", style=discord.ButtonStyle.secondary, custom_id="order_tip_btn")
@@ -441,7 +2207,7 @@ class OrderFormView(discord.ui.View):
             await interaction.response.send_message("❌ This is not a valid ticket.", ephemeral=True)
             return
 
-        modal = TipModal(self.guild_id, self.channel_id, ticket["preview_message_id"])
+        modal = TipModal(self.guild_id, self.channel_id, ticket.preview_message_id)
         await interaction.response.send_modal(modal)
 
     @discord.ui.button(label="Notes", style=discord.ButtonStyle.secondary, custom_id="order_notes_btn")
@@ -451,7 +2217,7 @@ class OrderFormView(discord.ui.View):
             await interaction.response.send_message("❌ This is not a valid ticket.", ephemeral=True)
             return
 
-        modal = NotesModal(self.guild_id, self.channel_id, ticket["preview_message_id"])
+        modal = NotesModal(self.guild_id, self.channel_id, ticket.preview_message_id)
         await interaction.response.send_modal(modal)
 
     @discord.ui.select(
@@ -480,28 +2246,26 @@ class OrderFormView(discord.ui.View):
 # ========== TICKET CREATION VIEW (PANEL) ==========
 
 class TicketPanel(discord.ui.View):
-    def __init__(self):
+    def __init__(self, guild_id: int | None = None):
         super().__init__(timeout=None)
 
-    @discord.ui.button(label="📝 New Order", style=discord.ButtonStyle.green, custom_id="ticket_new_order")
-    async def new_order(self, interaction: discord.Interaction, button: discord.ui.Button):
-        await self.create_ticket(interaction, "New Order", requires_link=True)
-
-    @discord.ui.button(label="⚠️ Order Issue", style=discord.ButtonStyle.red, custom_id="ticket_order_issue")
-    async def order_issue(self, interaction: discord.Interaction, button: discord.ui.Button):
-        await self.create_ticket(interaction, "Order Issue", requires_link=True)
-
-    @discord.ui.button(label="💰 Refund Request", style=discord.ButtonStyle.red, custom_id="ticket_refund")
-    async def refund_request(self, interaction: discord.Interaction, button: discord.ui.Button):
-        await self.create_ticket(interaction, "Refund Request", requires_link=True)
+        # One button per ticket type in the guild's config
+        for ticket_type in get_guild_config(guild_id)["ticket_types"]:
+            button = discord.ui.Button(
+                label=ticket_type["label"],
+                style=getattr(discord.ButtonStyle, ticket_type["style"], discord.ButtonStyle.secondary),
+                custom_id=ticket_type["custom_id"],
+            )
+            button.callback = self._button_callback(ticket_type)
+            self.add_item(button)
 
-    @discord.ui.button(label="🔗 Check Referral", style=discord.ButtonStyle.primary, custom_id="ticket_referral")
-    async def check_referral(self, interaction: discord.Interaction, button: discord.ui.Button):
-        await self.create_ticket(interaction, "Check Referral", requires_link=False)
+    async def interaction_check(self, interaction: discord.Interaction):
+        return await check_store_writable(interaction)
 
-    @discord.ui.button(label="❓ General Support", style=discord.ButtonStyle.gray, custom_id="ticket_support")
-    async def general_support(self, interaction: discord.Interaction, button: discord.ui.Button):
-        await self.create_ticket(interaction, "General Support", requires_link=False)
+    def _button_callback(self, ticket_type: dict):
+        async def callback(interaction: discord.Interaction):
+            await self.create_ticket(interaction, ticket_type["name"], ticket_type["requires_link"])
+        return callback
 
     async def create_ticket(self, interaction: discord.Interaction, ticket_type: str, requires_link: bool):
         if requires_link:
@@ -510,14 +2274,20 @@ class TicketPanel(discord.ui.View):
         else:
             await self.create_ticket_channel(interaction, ticket_type, order_link=None)
 
+    @profiled("create_ticket_channel")
     async def create_ticket_channel(self, interaction: discord.Interaction, ticket_type: str, order_link: str | None = None):
         guild = interaction.guild
         user = interaction.user
 
-        # Find or create Tickets category
-        category = discord.utils.get(guild.categories, name=TICKET_CATEGORY_NAME)
-        if not category:
-            category = await guild.create_category(TICKET_CATEGORY_NAME)
+        # Tickets category by id; only the first ticket (or one after the
+        # category was deleted) has to find or create it by name
+        config = get_guild_config(guild.id)
+        category = guild.get_channel(config["category_id"]) if config["category_id"] else None
+        if not isinstance(category, discord.CategoryChannel):
+            category = discord.utils.get(guild.categories, name=config["category_name"])
+            if not category:
+                category = await guild.create_category(config["category_name"])
+            set_guild_config_value(guild.id, "category_id", category.id)
 
         # Channel naming
         if ticket_type == "New Order":
@@ -540,6 +2310,7 @@ class TicketPanel(discord.ui.View):
 
         # Create ticket record
         create_ticket_record(guild.id, channel.id, user.id, ticket_type, order_link)
+        track_ticket_activity(guild.id, channel.id)
 
         # Welcome embed
         embed = discord.Embed(
@@ -574,6 +2345,10 @@ class TicketPanel(discord.ui.View):
                 f"✅ Ticket created! {channel.mention}", ephemeral=True
             )
 
+        ticket = get_ticket_record(guild.id, channel.id)
+        if ticket:
+            await dispatch_ticket(guild, ticket)
+
 
 # ========== ORDER LINK MODAL (FOR NEW ORDER / ISSUE / REFUND) ==========
 
@@ -591,42 +2366,66 @@ class OrderLinkModal(discord.ui.Modal):
         self.add_item(self.order_link)
 
     async def on_submit(self, interaction: discord.Interaction):
-        view = TicketPanel()
+        view = TicketPanel(interaction.guild_id)
         await view.create_ticket_channel(interaction, self.ticket_type, self.order_link.value)
 
 
 # ========== CLOSE TICKET VIEW ==========
 
+@profiled("close_ticket_channel")
+async def close_ticket_channel(channel, guild_id: int, closed_by: str, send=None):
+    # Shared by /close, the close button and auto-close
+    if not close_ticket_record(guild_id, channel.id):
+        # Already closed, its channel is on the way out
+        if send is not None:
+            await send("🔒 This ticket is already closed.", ephemeral=True)
+        return
+
+    embed = discord.Embed(
+        title="🔒 Ticket Closed",
+        description=f"This ticket has been closed by {closed_by}.\nChannel will be deleted in 10 seconds.",
+        color=0xE74C3C,
+    )
+
+    if send is None:
+        send = channel.send
+    await send(embed=embed)
+
+    # Delete in the background so the handler isn't held for 10 seconds
+    _spawn(_delete_channel_later(channel, 10))
+
+
+async def _delete_channel_later(channel, delay: float):
+    await asyncio.sleep(delay)
+    try:
+        await channel.delete()
+    except discord.NotFound:
+        pass
+
+
 class TicketCloseView(discord.ui.View):
     def __init__(self):
         super().__init__(timeout=None)
 
+    async def interaction_check(self, interaction: discord.Interaction):
+        return await check_store_writable(interaction)
+
     @discord.ui.button(label="🔒 Close Ticket", style=discord.ButtonStyle.red, custom_id="close_ticket")
     async def close_ticket(self, interaction: discord.Interaction, button: discord.ui.Button):
         channel = interaction.channel
 
-        tickets = load_tickets()
-        guild_id_str = str(interaction.guild_id)
-        channel_id_str = str(channel.id)
+        ticket = get_ticket_record(interaction.guild_id, channel.id)
 
-        if guild_id_str in tickets and channel_id_str in tickets[guild_id_str]:
-            ticket_data = tickets[guild_id_str][channel_id_str]
-            ticket_creator = ticket_data["user_id"]
+        if ticket:
+            ticket_creator = ticket.user_id
 
             if interaction.user.id == ticket_creator or interaction.user.guild_permissions.manage_channels:
-                close_ticket_record(interaction.guild_id, channel.id)
-
-                embed = discord.Embed(
-                    title="🔒 Ticket Closed",
-                    description=f"This ticket has been closed by {interaction.user.mention}.\nChannel will be deleted in 10 seconds.",
-                    color=0xE74C3C,
+                await close_ticket_channel(
+                    channel,
+                    interaction.guild_id,
+                    interaction.user.mention,
+                    send=interaction.response.send_message,
                 )
-
-                await interaction.response.send_message(embed=embed)
-
-                import asyncio
-                await asyncio.sleep(10)
-                await channel.delete()
             else:
                 await interaction.response.send_message(
                     "❌ Only the ticket creator or staff can close this ticket.",
@@ -639,6 +2438,285 @@ class TicketCloseView(discord.ui.View):
             )
 
 
+# ========== BULK OPERATIONS ==========
+
+def _last_message_time(channel_id: int):
+    # on_message only sees messages since this process started, so fall back
+    # to the channel's last message snowflake, which Discord keeps for us
+    state = _ticket_activity.get(channel_id)
+    if state and state["last_message"]:
+        return state["last_message"]
+    channel = bot.get_channel(channel_id)
+    last_message_id = getattr(channel, "last_message_id", None)
+    if last_message_id:
+        return discord.utils.snowflake_time(last_message_id).timestamp()
+    return None
+
+
+def find_ticket_channels(guild_id: int, status: str = "open", stale_days: int | None = None,
+                         ticket_type: str | None = None, submitted: bool | None = None):
+    cutoff = time.time() - stale_days * 86400 if stale_days is not None else None
+    matches = []
+
+    for channel_id, ticket in load_tickets().get(guild_id, {}).items():
+        if ticket.status != status:
+            continue
+        if ticket_type and ticket.type != ticket_type:
+            continue
+        if submitted is not None and ticket.order_submitted != submitted:
+            continue
+        if cutoff is not None:
+            if status == "closed":
+                last_seen = ticket.closed_at
+            else:
+                last_seen = _last_message_time(channel_id) or ticket.created_at
+            if last_seen is None or last_seen > cutoff:
+                continue
+        matches.append(channel_id)
+
+    return matches
+
+
+async def run_channel_pipeline(guild, channel_ids, action, label: str,
+                               progress_message=None, summary: str = ""):
+    # A fixed pool of workers drains the queue, so Discord sees at most
+    # BULK_CONCURRENCY requests from us no matter how many tickets matched.
+    queue = asyncio.Queue()
+    for channel_id in channel_ids:
+        queue.put_nowait(channel_id)
+
+    total = len(channel_ids)
+    progress = {"done": 0, "failed": 0, "reported_at": 0.0}
+
+    async def report(final: bool = False):
+        if progress_message is None:
+            return
+        now = time.monotonic()
+        if not final and now - progress["reported_at"] < BULK_PROGRESS_INTERVAL:
+            return
+        progress["reported_at"] = now
+        line = f"{label}: {progress['done']}/{total}"
+        if progress["failed"]:
+            line += f" ({progress['failed']} failed)"
+        if final:
+            line += " ✅"
+        try:
+            await progress_message.edit(content=f"{summary}\n{line}")
+        except discord.HTTPException:
+            pass
+
+    async def worker():
+        while True:
+            try:
+                channel_id = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            channel = guild.get_channel(channel_id)
+            try:
+                if channel is not None:
+                    await action(channel)
+            except discord.NotFound:
+                pass
+            except discord.HTTPException as e:
+                progress["failed"] += 1
+                print(f"[DEBUG] {label} failed for channel {channel_id}:", repr(e))
+            progress["done"] += 1
+            await report()
+
+    await asyncio.gather(*(worker() for _ in range(min(BULK_CONCURRENCY, total))))
+    await report(final=True)
+
+
+async def _start_bulk_pipeline(interaction: discord.Interaction, summary: str,
+                               channel_ids, action, label: str):
+    message = await interaction.followup.send(summary, ephemeral=True, wait=True)
+    if channel_ids:
+        _spawn(run_channel_pipeline(
+            interaction.guild, channel_ids, action, label,
+            progress_message=message, summary=summary,
+        ))
+
+
+async def _delete_channel(channel):
+    await channel.delete()
+
+
+# ========== EXPORT ==========
+
+# One flat row per ticket, order_details spread into their own columns
+EXPORT_COLUMNS = [
+    "guild_id", "channel_id", "user_id", "type", "status", "archived",
+    "created_at", "claimed_at", "closed_at", "updated_at", "claimed_by",
+    "order_submitted", "order_link", "account_name", "payment_methods",
+    "tip", "tip_amount", "delivery_type", "delivery_notes",
+]
+_EXPORT_TIME_COLUMNS = {"created_at", "claimed_at", "closed_at", "updated_at"}
+
+
+def _ticket_updated_at(ticket: Ticket):
+    if ticket.updated_at:
+        return ticket.updated_at
+    # Saved before updated_at existed, the newest stamp we do have
+    return max(t for t in (ticket.created_at, ticket.claimed_at, ticket.closed_at) if t is not None)
+
+
+def _tip_amount(tip: str):
+    # "$3" -> 3.0; percentages and free text have no dollar amount
+    tip = tip.strip()
+    if not tip.startswith("$"):
+        return None
+    try:
+        return float(tip[1:].replace(",", ""))
+    except ValueError:
+        return None
+
+
+def _epoch_to_datetime(epoch: float | None):
+    return datetime.fromtimestamp(epoch) if epoch else None
+
+
+def iter_archived_tickets():
+    # Streams tickets_archive.jsonl a line at a time
+    try:
+        f = open(TICKETS_ARCHIVE_FILE, "r")
+    except FileNotFoundError:
+        return
+    with f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                data = json.loads(line)
+                yield Ticket.from_dict(data["guild_id"], data["channel_id"], data)
+            except (json.JSONDecodeError, KeyError, TypeError, ValueError):
+                print(f"⚠️ Warning: skipping bad archive line {line_number}")
+
+
+def iter_export_tickets(guild_id: int | None = None, live=None):
+    # (ticket, archived) for live tickets, then the archive. `live` lets a
+    # caller hand over tickets it already picked on the event loop.
+    tickets = load_tickets()
+    if live is None:
+        live = (t for guild_tickets in tickets.values() for t in guild_tickets.values())
+
+    for ticket in live:
+        if guild_id is None or ticket.guild_id == guild_id:
+            yield ticket, False
+
+    for ticket in iter_archived_tickets():
+        if guild_id is not None and ticket.guild_id != guild_id:
+            continue
+        # A crash while archiving can leave a ticket in both places
+        if ticket.channel_id in tickets.get(ticket.guild_id, ()):
+            continue
+        yield ticket, True
+
+
+def iter_export_rows(tickets, since: float | None = None, cursor: dict | None = None):
+    # Rows whose last change is after `since`; the newest change seen goes
+    # into cursor["updated_at"] for the next incremental run
+    for ticket, archived in tickets:
+        updated_at = _ticket_updated_at(ticket)
+        if since is not None and updated_at <= since:
+            continue
+        if cursor is not None and updated_at > cursor.get("updated_at", 0):
+            cursor["updated_at"] = updated_at
+
+        details = ticket.order_details
+        yield (
+            ticket.guild_id,
+            ticket.channel_id,
+            ticket.user_id,
+            ticket.type,
+            ticket.status,
+            archived,
+            _epoch_to_datetime(ticket.created_at),
+            _epoch_to_datetime(ticket.claimed_at),
+            _epoch_to_datetime(ticket.closed_at),
+            _epoch_to_datetime(updated_at),
+            ticket.claimed_by,
+            ticket.order_submitted,
+            ticket.order_link,
+            details.account_name,
+            details.payment_methods,
+            details.tip,
+            _tip_amount(details.tip),
+            details.delivery_type,
+            details.delivery_notes,
+        )
+
+
+def _write_csv(rows, f):
+    writer = csv.writer(f)
+    writer.writerow(EXPORT_COLUMNS)
+    time_indexes = [i for i, name in enumerate(EXPORT_COLUMNS) if name in _EXPORT_TIME_COLUMNS]
+    count = 0
+    for row in rows:
+        row = list(row)
+        for i in time_indexes:
+            row[i] = row[i].isoformat(timespec="seconds") if row[i] else ""
+        writer.writerow(row)
+        count += 1
+    return count
+
+
+def _write_parquet(rows, path: str):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow)")
+
+    types = {
+        "guild_id": pa.int64(), "channel_id": pa.int64(), "user_id": pa.int64(),
+        "claimed_by": pa.int64(), "archived": pa.bool_(), "order_submitted": pa.bool_(),
+        "tip_amount": pa.float64(),
+    }
+    schema = pa.schema([
+        (name, pa.timestamp("ms") if name in _EXPORT_TIME_COLUMNS else types.get(name, pa.string()))
+        for name in EXPORT_COLUMNS
+    ])
+
+    # Row groups of EXPORT_BATCH_ROWS keep memory flat however long the history is
+    count = 0
+    with pq.ParquetWriter(path, schema) as writer:
+        while True:
+            batch = list(itertools.islice(rows, EXPORT_BATCH_ROWS))
+            if not batch:
+                break
+            columns = zip(*batch)
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(column, type=field.type) for column, field in zip(columns, schema)],
+                schema=schema,
+            ))
+            count += len(batch)
+    return count
+
+
+def export_tickets(path: str, fmt: str = "csv", guild_id: int | None = None,
+                   since: float | None = None, live=None):
+    # Returns (rows written, newest change exported or None)
+    cursor = {}
+    rows = iter_export_rows(iter_export_tickets(guild_id, live), since, cursor)
+
+    if fmt == "parquet":
+        count = _write_parquet(rows, path)
+    elif path == "-":
+        count = _write_csv(rows, sys.stdout)
+    else:
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            count = _write_csv(rows, f)
+    return count, cursor.get("updated_at")
+
+
+def _parse_since(value: str):
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+
 # ========== SLASH COMMANDS ==========
 
 @bot.tree.command(name="panel", description="Create the ticket panel (Admin only)")
@@ -649,21 +2727,22 @@ async def panel(interaction: discord.Interaction):
         )
         return
 
+    config = get_guild_config(interaction.guild_id)
+    branding = config["branding"]
+    type_lines = "\n".join(
+        f"**{t['label']}** - {t['description']}" for t in config["ticket_types"]
+    )
     embed = discord.Embed(
-        title="🎫 OneEats - Support Tickets",
+        title=f"🎫 {branding['name']} - Support Tickets",
         description=(
             "Need help? Create a ticket by clicking one of the buttons below!\n\n"
-            "**📝 New Order** - Submit a new group order\n"
-            "**⚠️ Order Issue** - Report a problem with your order\n"
-            "**💰 Refund Request** - Request a refund\n"
-            "**🔗 Check Referral** - Verify referral status\n"
-            "**❓ General Support** - Other questions"
+            + type_lines
         ),
-        color=0x00AEFF,
+        color=branding["color"],
     )
     embed.set_footer(text="We're open! Tap a button to get started.")
 
-    view = TicketPanel()
+    view = TicketPanel(interaction.guild_id)
     await interaction.channel.send(embed=embed, view=view)
     await interaction.response.send_message("✅ Ticket panel created!", ephemeral=True)
 
@@ -672,28 +2751,18 @@ async def panel(interaction: discord.Interaction):
 async def close(interaction: discord.Interaction):
     channel = interaction.channel
 
-    tickets = load_tickets()
-    guild_id_str = str(interaction.guild_id)
-    channel_id_str = str(channel.id)
+    ticket = get_ticket_record(interaction.guild_id, channel.id)
 
-    if guild_id_str in tickets and channel_id_str in tickets[guild_id_str]:
-        ticket_data = tickets[guild_id_str][channel_id_str]
-        ticket_creator = ticket_data["user_id"]
+    if ticket:
+        ticket_creator = ticket.user_id
 
         if interaction.user.id == ticket_creator or interaction.user.guild_permissions.manage_channels:
-            close_ticket_record(interaction.guild_id, channel.id)
-
-            embed = discord.Embed(
-                title="🔒 Ticket Closed",
-                description=f"This ticket has been closed by {interaction.user.mention}.\nChannel will be deleted in 10 seconds.",
-                color=0xE74C3C,
+            await close_ticket_channel(
+                channel,
+                interaction.guild_id,
+                interaction.user.mention,
+                send=interaction.response.send_message,
             )
-
-            await interaction.response.send_message(embed=embed)
-
-            import asyncio
-            await asyncio.sleep(10)
-            await channel.delete()
         else:
             await interaction.response.send_message(
                 "❌ Only the ticket creator or staff can close this ticket.",
@@ -717,11 +2786,7 @@ async def add_user(interaction: discord.Interaction, user: discord.Member):
         )
         return
 
-    tickets = load_tickets()
-    guild_id_str = str(interaction.guild_id)
-    channel_id_str = str(channel.id)
-
-    if guild_id_str in tickets and channel_id_str in tickets[guild_id_str]:
+    if get_ticket_record(interaction.guild_id, channel.id):
         await channel.set_permissions(user, read_messages=True, send_messages=True)
         await interaction.response.send_message(
             f"✅ Added {user.mention} to this ticket."
@@ -744,11 +2809,7 @@ async def remove_user(interaction: discord.Interaction, user: discord.Member):
         )
         return
 
-    tickets = load_tickets()
-    guild_id_str = str(interaction.guild_id)
-    channel_id_str = str(channel.id)
-
-    if guild_id_str in tickets and channel_id_str in tickets[guild_id_str]:
+    if get_ticket_record(interaction.guild_id, channel.id):
         await channel.set_permissions(user, read_messages=False)
         await interaction.response.send_message(
             f"✅ Removed {user.mention} from this ticket."
@@ -778,21 +2839,19 @@ async def status(interaction: discord.Interaction, state: app_commands.Choice[st
     is_open = state.value == "open"
     guild = interaction.guild
 
-    # 1) Make sure we only ever grab a TEXT channel, not a category
-    status_channel=interaction.channel
-
-    # Fallback: first text channel that looks like order/status
-    if not status_channel:
-        for ch in guild.text_channels:
-            if "order" in ch.name.lower() or "status" in ch.name.lower():
-                status_channel = ch
-                break
+    # 1) Configured status channel by id, otherwise the channel we're in.
+    # Make sure we only ever grab a TEXT channel, not a category
+    config = get_guild_config(guild.id)
+    branding = config["branding"]
+    status_channel = guild.get_channel(config["status_channel_id"]) if config["status_channel_id"] else None
+    if not isinstance(status_channel, discord.TextChannel):
+        status_channel = interaction.channel
 
-    if not status_channel:
+    if not isinstance(status_channel, discord.TextChannel):
         await interaction.response.send_message(
             f"❌ Couldn't find a text channel for status. "
-            f"Create a text channel named `{STATUS_CHANNEL_NAME}` "
-            f"or rename an existing one.",
+            f"Run this in a text channel like `{STATUS_CHANNEL_NAME}` "
+            f"or set one with `/config status_channel`.",
             ephemeral=True,
         )
         return
@@ -840,11 +2899,11 @@ async def status(interaction: discord.Interaction, state: app_commands.Choice[st
                     "Tap **Order** below to send us your details.\n\n"
                     "Ready to take your orders now! 🍽️"
                 ),
-                color=0x00FF00,
+                color=branding["open_color"],
             )
             embed.add_field(name="Status", value="✅ Taking Orders", inline=True)
-            embed.set_footer(text="OneEats")
-            view = TicketPanel()
+            embed.set_footer(text=branding["name"])
+            view = TicketPanel(guild.id)
             message = await status_channel.send(embed=embed, view=view)
         else:
             embed = discord.Embed(
@@ -853,10 +2912,10 @@ async def status(interaction: discord.Interaction, state: app_commands.Choice[st
                     "Sorry, we're not taking orders right now.\n\n"
                     "Check back later! 😊"
                 ),
-                color=0xFF0000,
+                color=branding["closed_color"],
             )
             embed.add_field(name="Status", value="❌ Closed", inline=True)
-            embed.set_footer(text="OneEats")
+            embed.set_footer(text=branding["name"])
             message = await status_channel.send(embed=embed)
 
         embed.timestamp = datetime.now()
@@ -897,12 +2956,443 @@ async def status(interaction: discord.Interaction, state: app_commands.Choice[st
         )
 
 
+@bot.tree.command(name="stats", description="Show ticket and order stats (Staff only)")
+async def stats(interaction: discord.Interaction):
+    if not interaction.user.guild_permissions.manage_channels:
+        await interaction.response.send_message(
+            "❌ You need 'Manage Channels' permission.", ephemeral=True
+        )
+        return
+
+    await interaction.response.send_message(embed=build_stats_embed(interaction.guild_id), ephemeral=True)
+
+
+@bot.tree.command(name="claim", description="Claim the next ticket in the queue (Staff only)")
+async def claim(interaction: discord.Interaction):
+    if not interaction.user.guild_permissions.manage_channels:
+        await interaction.response.send_message(
+            "❌ You need 'Manage Channels' permission.", ephemeral=True
+        )
+        return
+
+    ticket = pop_next_ticket(interaction.guild_id)
+    if ticket is None:
+        await interaction.response.send_message("📭 The ticket queue is empty.", ephemeral=True)
+        return
+
+    await interaction.response.defer(ephemeral=True, thinking=True)
+    channel = await assign_ticket(interaction.guild, ticket, interaction.user)
+    where = channel.mention if channel else "a ticket whose channel no longer exists"
+    await interaction.followup.send(
+        f"✅ You claimed {where} ({ticket.type}).", ephemeral=True
+    )
+
+
+@bot.tree.command(name="queue", description="Show the ticket queue (Staff only)")
+async def queue(interaction: discord.Interaction):
+    if not interaction.user.guild_permissions.manage_channels:
+        await interaction.response.send_message(
+            "❌ You need 'Manage Channels' permission.", ephemeral=True
+        )
+        return
+
+    await interaction.response.send_message(embed=build_queue_embed(interaction.guild_id), ephemeral=True)
+
+
+@bot.tree.command(name="config", description="Show or set this server's ticket channels (Admin only)")
+@app_commands.describe(
+    category="Category new ticket channels are created in",
+    status_channel="Channel /status posts the open/closed message in",
+    feed_channel="Channel staff get batched order digests in",
+)
+async def config(interaction: discord.Interaction,
+                 category: discord.CategoryChannel | None = None,
+                 status_channel: discord.TextChannel | None = None,
+                 feed_channel: discord.TextChannel | None = None):
+    if not interaction.user.guild_permissions.administrator:
+        await interaction.response.send_message(
+            "❌ You need Administrator permission.", ephemeral=True
+        )
+        return
+
+    for key, channel in (
+        ("category_id", category),
+        ("status_channel_id", status_channel),
+        ("feed_channel_id", feed_channel),
+    ):
+        if channel is not None:
+            set_guild_config_value(interaction.guild_id, key, channel.id)
+
+    current = get_guild_config(interaction.guild_id)
+
+    def mention(channel_id):
+        return f"<#{channel_id}>" if channel_id else "Not set"
+
+    await interaction.response.send_message(
+        f"⚙️ **Ticket config**\n"
+        f"Category: {mention(current['category_id'])}\n"
+        f"Status channel: {mention(current['status_channel_id'])}\n"
+        f"Staff feed: {mention(current['feed_channel_id'])}\n"
+        f"Ticket types: {', '.join(t['name'] for t in current['ticket_types'])}",
+        ephemeral=True,
+    )
+
+
+@bot.tree.command(name="reloadconfig", description="Reload guild_config.json without restarting (Admin only)")
+async def reloadconfig(interaction: discord.Interaction):
+    if not interaction.user.guild_permissions.administrator:
+        await interaction.response.send_message(
+            "❌ You need Administrator permission.", ephemeral=True
+        )
+        return
+
+    if not reload_guild_config():
+        await interaction.response.send_message(
+            f"❌ `{os.path.basename(GUILD_CONFIG_FILE)}` is not valid JSON. "
+            "Kept the current config, fix the file and try again.",
+            ephemeral=True,
+        )
+        return
+
+    await interaction.response.send_message(
+        "🔄 Config reloaded. Run `/panel` again to pick up changed ticket types.",
+        ephemeral=True,
+    )
+
+
+@bot.tree.command(name="profile", description="Turn profiling of a handler on or off (Admin only)")
+@app_commands.describe(
+    action="Start, stop or show what's being profiled",
+    target="Handler or storage step to profile (default: all)",
+)
+@app_commands.choices(
+    action=[
+        app_commands.Choice(name="On", value="on"),
+        app_commands.Choice(name="Off", value="off"),
+        app_commands.Choice(name="Status", value="status"),
+    ]
+)
+async def profile(interaction: discord.Interaction, action: app_commands.Choice[str],
+                  target: str | None = None):
+    if not interaction.user.guild_permissions.administrator:
+        await interaction.response.send_message(
+            "❌ You need Administrator permission.", ephemeral=True
+        )
+        return
+
+    if target and target not in _profile_registry:
+        await interaction.response.send_message(
+            f"❌ Unknown target. Pick one of: {', '.join(sorted(_profile_registry))}",
+            ephemeral=True,
+        )
+        return
+
+    if action.value == "on":
+        set_profiling(_profile_targets | ({target} if target else set(_profile_registry)))
+    elif action.value == "off":
+        set_profiling(_profile_targets - {target} if target else ())
+
+    enabled = ", ".join(sorted(_profile_targets)) or "nothing"
+    await interaction.response.send_message(
+        f"🔬 Profiling: **{enabled}**\n"
+        f"1 in {PROFILE_SAMPLE_EVERY} calls, at most {PROFILE_MAX_PER_MINUTE}/min, "
+        f"written to `{PROFILE_DIR}`",
+        ephemeral=True,
+    )
+
+
+@profile.autocomplete("target")
+async def profile_target_autocomplete(interaction: discord.Interaction, current: str):
+    return [
+        app_commands.Choice(name=name, value=name)
+        for name in sorted(_profile_registry)
+        if current.lower() in name.lower()
+    ][:25]
+
+
+@bot.tree.command(name="export", description="Export this server's ticket history (Admin only)")
+@app_commands.describe(
+    file_format="CSV for spreadsheets, Parquet for BI tools",
+    since_days="Only tickets created or changed in the last N days",
+)
+@app_commands.choices(
+    file_format=[
+        app_commands.Choice(name="CSV", value="csv"),
+        app_commands.Choice(name="Parquet", value="parquet"),
+    ]
+)
+async def export(interaction: discord.Interaction, file_format: app_commands.Choice[str] | None = None,
+                 since_days: int | None = None):
+    if not interaction.user.guild_permissions.administrator:
+        await interaction.response.send_message(
+            "❌ You need Administrator permission.", ephemeral=True
+        )
+        return
+
+    await interaction.response.defer(ephemeral=True, thinking=True)
+
+    fmt = file_format.value if file_format else "csv"
+    since = time.time() - since_days * 86400 if since_days is not None else None
+    # Pick this guild's live tickets on the loop; formatting, the archive
+    # and file I/O run in a worker thread
+    live = list(load_tickets().get(interaction.guild_id, {}).values())
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, f"tickets-{datetime.now().strftime('%Y%m%d-%H%M%S')}.{fmt}")
+        try:
+            count, _ = await asyncio.get_running_loop().run_in_executor(
+                None, export_tickets, path, fmt, interaction.guild_id, since, live
+            )
+        except RuntimeError as e:
+            await interaction.followup.send(f"❌ {e}", ephemeral=True)
+            return
+        except OSError as e:
+            print("[ERROR] Ticket export failed:", repr(e))
+            await interaction.followup.send(f"❌ Export failed: {e.strerror or e}", ephemeral=True)
+            return
+
+        if os.path.getsize(path) > interaction.guild.filesize_limit:
+            await interaction.followup.send(
+                f"❌ The export ({count} rows) is too big to upload here. "
+                f"Run `python ticket_bot.py export` on the server instead.",
+                ephemeral=True,
+            )
+            return
+
+        await interaction.followup.send(
+            f"📤 Exported **{count}** ticket(s).",
+            file=discord.File(path),
+            ephemeral=True,
+        )
+
+
+async def ticket_type_autocomplete(interaction: discord.Interaction, current: str):
+    # Each guild can configure its own ticket types, so no fixed choices
+    return [
+        app_commands.Choice(name=t["name"], value=t["name"])
+        for t in get_guild_config(interaction.guild_id)["ticket_types"]
+        if current.lower() in t["name"].lower()
+    ][:25]
+
+
+@bot.tree.command(name="bulkclose", description="Close tickets matching a filter (Admin only)")
+@app_commands.describe(
+    stale_days="Only tickets with no messages for at least this many days",
+    ticket_type="Only tickets of this type",
+    submitted="Only tickets whose order was (or wasn't) submitted",
+)
+async def bulk_close(interaction: discord.Interaction, stale_days: int | None = None,
+                     ticket_type: str | None = None,
+                     submitted: bool | None = None):
+    if not interaction.user.guild_permissions.administrator:
+        await interaction.response.send_message(
+            "❌ You need Administrator permission.", ephemeral=True
+        )
+        return
+
+    if stale_days is None and ticket_type is None and submitted is None:
+        await interaction.response.send_message(
+            "❌ Pick at least one filter (stale_days, ticket_type or submitted).",
+            ephemeral=True,
+        )
+        return
+
+    await interaction.response.defer(ephemeral=True, thinking=True)
+
+    channel_ids = find_ticket_channels(
+        interaction.guild_id,
+        stale_days=stale_days,
+        ticket_type=ticket_type,
+        submitted=submitted,
+    )
+    closed = close_ticket_records(interaction.guild_id, channel_ids)
+
+    await _start_bulk_pipeline(
+        interaction,
+        f"🔒 Closed **{len(closed)}** ticket(s).",
+        closed,
+        _delete_channel,
+        "🗑️ Deleting channels",
+    )
+
+
+bulk_close.autocomplete("ticket_type")(ticket_type_autocomplete)
+
+
+@bot.tree.command(name="bulkpurge", description="Archive closed tickets and delete leftover channels (Admin only)")
+@app_commands.describe(older_than_days="Only tickets closed at least this many days ago")
+async def bulk_purge(interaction: discord.Interaction, older_than_days: int = 0):
+    if not interaction.user.guild_permissions.administrator:
+        await interaction.response.send_message(
+            "❌ You need Administrator permission.", ephemeral=True
+        )
+        return
+
+    await interaction.response.defer(ephemeral=True, thinking=True)
+
+    channel_ids = find_ticket_channels(
+        interaction.guild_id, status="closed", stale_days=older_than_days
+    )
+    archived = archive_ticket_records(interaction.guild_id, channel_ids)
+    # Channels normally go 10s after closing; clean up any that survived a restart
+    leftovers = [c for c in archived if interaction.guild.get_channel(c) is not None]
+
+    await _start_bulk_pipeline(
+        interaction,
+        f"🧹 Archived **{len(archived)}** closed ticket(s), "
+        f"{len(leftovers)} leftover channel(s) to delete.",
+        leftovers,
+        _delete_channel,
+        "🗑️ Deleting channels",
+    )
+
+
+@bot.tree.command(name="bulkmove", description="Move open tickets matching a filter to a category (Admin only)")
+@app_commands.describe(
+    category="Category to move the ticket channels into",
+    stale_days="Only tickets with no messages for at least this many days",
+    ticket_type="Only tickets of this type",
+    submitted="Only tickets whose order was (or wasn't) submitted",
+)
+async def bulk_move(interaction: discord.Interaction, category: discord.CategoryChannel,
+                    stale_days: int | None = None,
+                    ticket_type: str | None = None,
+                    submitted: bool | None = None):
+    if not interaction.user.guild_permissions.administrator:
+        await interaction.response.send_message(
+            "❌ You need Administrator permission.", ephemeral=True
+        )
+        return
+
+    await interaction.response.defer(ephemeral=True, thinking=True)
+
+    channel_ids = find_ticket_channels(
+        interaction.guild_id,
+        stale_days=stale_days,
+        ticket_type=ticket_type,
+        submitted=submitted,
+    )
+
+    async def move(channel):
+        await channel.edit(category=category)
+
+    await _start_bulk_pipeline(
+        interaction,
+        f"📦 Moving **{len(channel_ids)}** ticket(s) to **{category.name}**.",
+        channel_ids,
+        move,
+        "📦 Moving channels",
+    )
+
+
+bulk_move.autocomplete("ticket_type")(ticket_type_autocomplete)
+
 
 # ========== RUN BOT ==========
 
-if __name__ == "__main__":
+def run_bot():
     TOKEN = os.getenv("DISCORD_BOT_TOKEN_TICKETS")
     if not TOKEN:
         print("❌ Error: DISCORD_BOT_TOKEN_TICKETS not found in .env file")
     else:
-        bot.run(TOKEN)
+        acquire_store_lock(wait=STORE_LOCK_MODE != "readonly")
+        try:
+            bot.run(TOKEN)
+        finally:
+            shutdown_store()
+
+
+def cli_snapshots(args):
+    snapshots = list_snapshots()
+    if not snapshots:
+        print(f"No snapshots in {SNAPSHOT_DIR}")
+    for path in snapshots:
+        print(f"{os.path.basename(path)}  {os.path.getsize(path) / 1024:.1f} KB")
+
+
+def cli_restore(args):
+    snapshots = list_snapshots()
+    if args.snapshot:
+        path = args.snapshot
+        if not os.path.exists(path):
+            path = os.path.join(SNAPSHOT_DIR, args.snapshot)
+    elif snapshots:
+        path = snapshots[0]
+    else:
+        print(f"❌ No snapshots in {SNAPSHOT_DIR}")
+        return 1
+
+    if not acquire_store_lock(wait=False, handover=False):
+        print("❌ The bot is running. Stop it before restoring.")
+        return 1
+
+    try:
+        # Read it before the safety snapshot below can rotate anything out
+        data = read_snapshot(path)
+        # Keep what's on disk now, in case this was the wrong snapshot
+        current = write_snapshot(capture_snapshot(), keep_path=path)
+        print(f"💾 Saved current data as {os.path.basename(current)}")
+        restore_snapshot(data)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"❌ Restore failed: {e!r}")
+        return 1
+    finally:
+        shutdown_store()
+
+    print(f"✅ Restored data from {os.path.basename(path)}")
+    return 0
+
+
+def cli_export(args):
+    since = _parse_since(args.since) if args.since else None
+    if since is None and args.cursor_file and os.path.exists(args.cursor_file):
+        with open(args.cursor_file, "r") as f:
+            since = _parse_since(f.read().strip())
+
+    started_at = time.time()
+    try:
+        count, newest = export_tickets(args.output, args.format, args.guild, since)
+    except (RuntimeError, OSError) as e:
+        print(f"❌ Export failed: {e}", file=sys.stderr)
+        return 1
+
+    # Only move the cursor once the export is safely written. Changes still
+    # waiting for a flush can be stamped earlier than `newest`, so the cursor
+    # lags; rows in that window show up again next time, dedupe on channel_id.
+    if args.cursor_file and newest is not None:
+        with open(args.cursor_file, "w") as f:
+            f.write(repr(min(newest, started_at - EXPORT_CURSOR_LAG)))
+    print(f"✅ Exported {count} ticket(s)", file=sys.stderr)
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="OneEats ticket bot")
+    subcommands = parser.add_subparsers(dest="command")
+    subcommands.add_parser("run", help="Run the bot (default)")
+    subcommands.add_parser("snapshots", help="List data snapshots, newest first")
+    restore = subcommands.add_parser("restore", help="Restore data from a snapshot")
+    restore.add_argument("snapshot", nargs="?", help="Snapshot file (default: newest)")
+    export = subcommands.add_parser("export", help="Export live and archived tickets")
+    export.add_argument("output", help="Output file, or - for CSV on stdout")
+    export.add_argument("--format", choices=["csv", "parquet"], default="csv",
+                        help="parquet needs pyarrow installed")
+    export.add_argument("--guild", type=int, help="Only this guild id")
+    export.add_argument("--since", help="Only tickets changed after this epoch or ISO time")
+    export.add_argument("--cursor-file",
+                        help="Read --since from this file and save the newest change exported, "
+                             "for incremental runs (the last few seconds can repeat)")
+    args = parser.parse_args(argv)
+    start_profiling_from_env()
+
+    if args.command == "snapshots":
+        return cli_snapshots(args)
+    if args.command == "restore":
+        return cli_restore(args)
+    if args.command == "export":
+        return cli_export(args)
+    return run_bot()
+
+
+if __name__ == "__main__":
+    sys.exit(main())